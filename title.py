@@ -3,14 +3,33 @@
 # Complete Chapters 1+2 - Mother 3 + Super Mario RPG Style!
 # No external files - Everything generated in code!
 
+import time
+_STARTUP_MARKS = [("start", "import", time.perf_counter())]   # See StartupTimeline
+
 import pygame
+_STARTUP_MARKS.append(("import pygame", "import", time.perf_counter()))
+import argparse
+import asyncio
+import bisect
+import hashlib
+import heapq
 import math
+import multiprocessing
 import random
 import json
+import os
+import platform
+import threading
+from array import array
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from enum import Enum
 from dataclasses import dataclass
 from typing import List, Dict, Tuple, Optional
 
+import numpy as np
+_STARTUP_MARKS.append(("import numpy + stdlib", "import", time.perf_counter()))
+
 # ============================================================================
 # GBA ENGINE CONSTANTS (240x160 scaled 3x)
 # ============================================================================
@@ -20,6 +39,7 @@ GBA_HEIGHT = 160
 SCALE = 3
 SCREEN_WIDTH = GBA_WIDTH * SCALE
 SCREEN_HEIGHT = GBA_HEIGHT * SCALE
+SAMPLE_RATE = 22050
 
 # GBA Color Palette (15-bit RGB, limited palette)
 COLORS = {
@@ -55,61 +75,781 @@ COLORS = {
 for k, v in COLORS.items():
     globals()[k] = v
 
+# ============================================================================
+# FRAME PROFILER (Per-section frame cost)
+# ============================================================================
+
+class FrameProfiler:
+    """Rolling per-frame cost of named sections (update, draw, effects...)"""
+    
+    def __init__(self, window=120):
+        self.window = window
+        self.current = {}   # section -> seconds spent this frame
+        self.history = {}   # section -> deque of per-frame seconds
+        self.frames = 0
+        
+    @contextmanager
+    def section(self, name):
+        """Time a block and charge it to a named section"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+            
+    def add(self, name, seconds):
+        self.current[name] = self.current.get(name, 0.0) + seconds
+        
+    def end_frame(self):
+        """Close the current frame and roll its costs into the history"""
+        for name, seconds in self.current.items():
+            if name not in self.history:
+                self.history[name] = deque(maxlen=self.window)
+            self.history[name].append(seconds)
+        self.current.clear()
+        self.frames += 1
+        
+    def averages(self):
+        """Average milliseconds per frame for every section"""
+        return {name: 1000 * sum(costs) / len(costs)
+                for name, costs in self.history.items() if costs}
+        
+    def report(self):
+        """Human-readable cost table, most expensive first"""
+        lines = [f"Frame profile (last {self.window} frames, {self.frames} total)"]
+        for name, ms in sorted(self.averages().items(), key=lambda kv: -kv[1]):
+            lines.append(f"  {name:<24} {ms:7.3f} ms")
+        return "\n".join(lines)
+
+# ============================================================================
+# STARTUP TIMELINE (Wall-clock phases from the first import to a loaded game)
+# ============================================================================
+
+class StartupTimeline:
+    """Wall-clock startup phases since title.py began importing
+
+    Phases are tagged "import", "init" or "generation" so the report can
+    say where a cold start goes. mark() ends a phase that began at the
+    previous mark; phase() times a block that may start later, such as
+    a deferred stage run between frames.
+    """
+    
+    def __init__(self, marks=None):
+        marks = marks or [("start", "import", time.perf_counter())]
+        self.origin = marks[0][2]
+        self.phases = [(name, kind, before, end) for (_, _, before), (name, kind, end)
+                       in zip(marks, marks[1:])]     # (name, kind, start, end)
+        self.visible = None         # When the title was first presented
+        
+    def mark(self, name, kind="init"):
+        before = self.phases[-1][3] if self.phases else self.origin
+        self.phases.append((name, kind, before, time.perf_counter()))
+        
+    @contextmanager
+    def phase(self, name, kind="init"):
+        start = time.perf_counter()
+        yield
+        self.phases.append((name, kind, start, time.perf_counter()))
+        
+    def title_visible(self):
+        self.mark("title frame")
+        self.visible = self.phases[-1][3]
+        
+    def report(self):
+        """Human-readable timeline with per-phase and per-kind totals"""
+        lines = [f"Startup timeline ({len(self.phases)} phases):",
+                 f"  {'phase':<24} {'kind':<11} {'took ms':>8} {'done at ms':>11}"]
+        totals = {}
+        for name, kind, start, end in self.phases:
+            took = 1000 * (end - start)
+            totals[kind] = totals.get(kind, 0.0) + took
+            lines.append(f"  {name:<24} {kind:<11} {took:8.1f} {1000 * (end - self.origin):11.1f}")
+        lines.append("  " + ", ".join(f"{kind} {ms:.1f} ms" for kind, ms in totals.items()))
+        if self.visible is not None:
+            lines.append(f"  Title visible after {1000 * (self.visible - self.origin):.1f} ms, "
+                         f"fully loaded after {1000 * (self.phases[-1][3] - self.origin):.1f} ms")
+        return "\n".join(lines)
+
+# ============================================================================
+# RENDER LISTS (Record while simulating, rasterize when presenting)
+# ============================================================================
+
+LAYER = "layer"     # Render list op: blit a cached rasterized sub-list
+
+class RenderList:
+    """Draw commands for one frame, recorded now and rasterized later
+
+    Mirrors the Surface and pygame.draw calls the draw code uses. Each op
+    is (function, args) replayed as function(surface, *args); positions
+    and rects are copied into tuples, so a frozen list can be handed to
+    the presentation thread while the simulation moves on.
+    """
+    
+    __slots__ = ("ops",)
+    
+    def __init__(self):
+        self.ops = []
+        
+    def fill(self, color, rect=None):
+        self.ops.append((pygame.Surface.fill, (color, rect and tuple(rect))))
+        
+    def blit(self, source, dest, area=None):
+        self.ops.append((pygame.Surface.blit, (source, tuple(dest), area)))
+        
+    def blits(self, blit_sequence, doreturn=False):
+        self.ops.append((pygame.Surface.blits, (tuple(blit_sequence), False)))
+        
+    def rect(self, color, rect, width=0):
+        self.ops.append((pygame.draw.rect, (color, tuple(rect), width)))
+        
+    def circle(self, color, center, radius, width=0):
+        self.ops.append((pygame.draw.circle, (color, tuple(center), radius, width)))
+        
+    def line(self, color, start, end, width=1):
+        self.ops.append((pygame.draw.line, (color, tuple(start), tuple(end), width)))
+        
+    def polygon(self, color, points, width=0):
+        self.ops.append((pygame.draw.polygon, (color, tuple(points), width)))
+        
+    def layer(self, ops, dim=False):
+        """Draw a frozen sub-list (the scene under an overlay) as one blit"""
+        self.ops.append((LAYER, (ops, dim)))
+        
+    def freeze(self):
+        return tuple(self.ops)
+
+@dataclass(frozen=True)
+class RenderFrame:
+    """Everything the presenter needs to show one simulated frame"""
+    number: int
+    ops: tuple
+    effects: tuple                  # ScreenEffects.levels() at record time
+    input_time: Optional[float]     # perf_counter of the oldest input handled
+
+class RenderPipeline:
+    """Double buffer between the simulation and presentation threads
+
+    The simulation publishes into the pending slot while the presenter
+    owns the frame it is rasterizing. Publishing over a frame that was
+    never taken counts as a dropped frame.
+    """
+    
+    def __init__(self):
+        self.ready = threading.Condition()
+        self.pending = None
+        self.published = 0
+        self.dropped = 0
+        
+    def publish(self, render):
+        with self.ready:
+            if self.pending is not None:
+                self.dropped += 1
+            self.pending = render
+            self.published += 1
+            self.ready.notify()
+            
+    def take(self, timeout=None):
+        """Wait up to timeout for the next frame (None if none arrived)"""
+        with self.ready:
+            if self.pending is None:
+                self.ready.wait(timeout)
+            render, self.pending = self.pending, None
+            return render
+
+class PresentStats:
+    """Throughput, late flips and input-to-flip latency of presented frames"""
+    
+    LATE = 1.5 / 60     # A flip gap this long missed at least one refresh
+    
+    def __init__(self, window=600):
+        self.flips = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self.presented = 0
+        self.late = 0
+        
+    def flipped(self, render):
+        now = time.perf_counter()
+        if self.flips and now - self.flips[-1] > self.LATE:
+            self.late += 1
+        self.flips.append(now)
+        self.presented += 1
+        if render.input_time is not None:
+            self.latencies.append(now - render.input_time)
+            
+    def summary(self):
+        """Presented FPS, late flips and input latency (ms) as a dict"""
+        span = self.flips[-1] - self.flips[0] if len(self.flips) > 1 else 0
+        latencies = sorted(self.latencies)
+        return {
+            "fps": (len(self.flips) - 1) / span if span else 0.0,
+            "presented": self.presented,
+            "late": self.late,
+            "latency_ms": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p95_ms": 1000 * latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+        }
+
+# ============================================================================
+# ASYNC FRAME LOOP (60 Hz frame task + time-sliced background coroutines)
+# ============================================================================
+
+SPIN_MARGIN = 0.002         # Spin the last 2 ms; event loop sleeps overshoot
+OVERRUN_TOLERANCE = 0.001   # Frames starting later than this are late
+BACKGROUND_SLICE = 0.004    # Background time per frame
+DEADLINE_RUSH = 0.25        # Jobs this close to their deadline get all idle time
+
+async def precise_sleep(deadline):
+    """Sleep on the event loop until perf_counter() reaches deadline
+
+    The coarse sleep lets background jobs run; the tail is spun because
+    select() timeouts overshoot by up to a millisecond.
+    """
+    delay = deadline - time.perf_counter() - SPIN_MARGIN
+    if delay > 0:
+        await asyncio.sleep(delay)
+    while time.perf_counter() < deadline:
+        pass
+
+class BackgroundJob:
+    """Timing record of one background coroutine"""
+    __slots__ = ("name", "task", "deadline", "resumed", "busy", "steps",
+                 "longest", "finished")
+    
+    def __init__(self, name, deadline):
+        self.name = name
+        self.task = None
+        self.deadline = deadline    # perf_counter, or None
+        self.resumed = 0.0
+        self.busy = 0.0
+        self.steps = 0
+        self.longest = 0.0
+        self.finished = None
+        
+    @property
+    def missed_deadline(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return self.deadline is not None and end > self.deadline
+
+class FrameScheduler:
+    """Runs background coroutines in a slice of each frame's idle time
+
+    Jobs call `await scheduler.checkpoint()` between small units of work.
+    Inside the slice that just yields; once the slice is spent the job
+    parks until the next frame opens a new one. A job that runs past the
+    slice and makes the next frame start late is reported as an overrun.
+    """
+    
+    def __init__(self, fps=60, slice_seconds=BACKGROUND_SLICE):
+        self.period = 1 / fps
+        self.slice = slice_seconds
+        self.slice_end = 0.0
+        self.running = False
+        self.jobs = {}              # task -> BackgroundJob
+        self.finished = deque(maxlen=64)
+        self.parked = []            # futures of jobs waiting for the next slice
+        self.culprits = set()       # jobs that ran past the current slice
+        self.frames = 0
+        self.late_frames = 0
+        self.overrun_count = 0
+        self.overruns = deque(maxlen=256)   # (frame, ms late, job names)
+        
+    def spawn(self, name, coro, deadline=None):
+        """Schedule a coroutine; deadline is seconds from now"""
+        if deadline is not None:
+            deadline += time.perf_counter()
+        job = BackgroundJob(name, deadline)
+        job.task = asyncio.get_running_loop().create_task(self._run(job, coro))
+        self.jobs[job.task] = job
+        return job
+        
+    async def _run(self, job, coro):
+        try:
+            await self._park()
+            job.resumed = time.perf_counter()
+            await coro
+            self._account(job)
+        finally:
+            job.finished = time.perf_counter()
+            del self.jobs[job.task]
+            self.finished.append(job)
+            
+    def _account(self, job):
+        now = time.perf_counter()
+        step = now - job.resumed
+        job.busy += step
+        job.steps += 1
+        job.longest = max(job.longest, step)
+        if now > self.slice_end + OVERRUN_TOLERANCE:
+            self.culprits.add(job.name)
+        return now
+        
+    async def checkpoint(self):
+        """Yield between work units; parks once this frame's slice is spent"""
+        job = self.jobs[asyncio.current_task()]
+        self._account(job)
+        await asyncio.sleep(0)      # Other jobs may use up the slice meanwhile
+        if time.perf_counter() >= self.slice_end:
+            await self._park()
+        job.resumed = time.perf_counter()
+        
+    async def _park(self):
+        # Jobs woken behind one that used up the slice wait another frame
+        while True:
+            future = asyncio.get_running_loop().create_future()
+            self.parked.append(future)
+            await future
+            if time.perf_counter() < self.slice_end:
+                return
+        
+    def remaining(self):
+        """Seconds left in the current slice"""
+        return max(0.0, self.slice_end - time.perf_counter())
+        
+    def frame_started(self, scheduled):
+        """Record how late the frame due at `scheduled` started"""
+        self.frames += 1
+        late = time.perf_counter() - scheduled
+        if late > OVERRUN_TOLERANCE:
+            self.late_frames += 1
+            if self.culprits:
+                self.overrun_count += 1
+                self.overruns.append((self.frames, 1000 * late, sorted(self.culprits)))
+        self.culprits = set()
+        
+    async def idle(self, next_frame):
+        """Open this frame's background slice, then sleep until next_frame
+
+        Jobs close to their deadline get all the idle time instead of the
+        usual slice.
+        """
+        now = time.perf_counter()
+        rush = any(job.deadline is not None and job.deadline - now < DEADLINE_RUSH
+                   for job in self.jobs.values())
+        end = next_frame - SPIN_MARGIN
+        self.slice_end = end if rush else min(now + self.slice, end)
+        parked, self.parked = self.parked, []
+        for future in parked:
+            future.set_result(None)
+        await precise_sleep(next_frame)
+        
+    def cancel_all(self):
+        for task in list(self.jobs):
+            task.cancel()
+            
+    def report(self):
+        """Human-readable frame lateness and per-job timing"""
+        lines = [f"Async loop: {self.frames} frames, {self.late_frames} started late, "
+                 f"{self.overrun_count} late because of background work"]
+        for frame, ms, names in sorted(self.overruns, key=lambda o: -o[1])[:5]:
+            lines.append(f"  frame {frame:<6} +{ms:6.2f} ms  {', '.join(names)}")
+        jobs = list(self.finished) + list(self.jobs.values())
+        if jobs:
+            lines.append(f"  {'job':<26} {'steps':>6} {'busy ms':>9} {'longest':>8}  deadline")
+        for job in jobs:
+            deadline = ("-" if job.deadline is None else
+                        "MISSED" if job.missed_deadline else "met")
+            if job.finished is None:
+                deadline += " (running)"
+            lines.append(f"  {job.name:<26} {job.steps:>6} {1000 * job.busy:9.2f} "
+                         f"{1000 * job.longest:8.2f}  {deadline}")
+        return "\n".join(lines)
+
+# ============================================================================
+# ASSET LIFECYCLE (Scoped loading + LRU memory budget)
+# ============================================================================
+
+ASSET_BUDGET = 1024 * 1024  # Bytes of generated assets kept resident
+PREFETCH_DEADLINE = 2.0     # Seconds a background prefetch may take
+
+# Scopes warmed up when a map is entered, so the next transition in
+# _check_scene_triggers never stalls on asset generation
+MAP_PREFETCH = {
+    "school": ["map:dark_forest", "battle"],
+    "dark_forest": ["map:twilight_town", "chapter:2"],
+    "twilight_town": ["battle"]
+}
+
+# Walking NPCs spawned per map: (sprite, count)
+MAP_NPCS = {
+    "twilight_town": [("townsfolk_a", 16), ("townsfolk_b", 16)]
+}
+MAP_CHASERS = {
+    "dark_forest": [("forest_shroom", 2)]  # Visible encounters that hunt the player
+}
+
+def asset_size(asset):
+    """Approximate resident size of a generated asset in bytes"""
+    if isinstance(asset, pygame.Surface):
+        return asset.get_pitch() * asset.get_height()
+    if isinstance(asset, pygame.mixer.Sound):
+        return len(asset.get_raw())
+    if isinstance(asset, np.ndarray):
+        return asset.nbytes
+    if isinstance(asset, GBASprite):
+        return asset.width * asset.height * 4 * len(FACINGS) * SHEET_COLUMNS
+    return 0
+
+class AssetManager:
+    """Scope-tagged asset cache with LRU eviction under a memory budget
+
+    Scopes are "global", "chapter:<n>", "map:<name>" and "battle". Assets
+    of active scopes are never evicted; everything else is dropped oldest
+    first once the budget is exceeded and regenerated on next use.
+    """
+
+    def __init__(self, budget=ASSET_BUDGET):
+        self.budget = budget
+        self.entries = {}             # (kind, name) -> (scope, loader)
+        self.loaded = OrderedDict()   # (kind, name) -> asset, oldest first
+        self.sizes = {}
+        self.used = 0
+        self.active_scopes = {"global"}
+        self.stats = {"loads": 0, "hits": 0, "misses": 0,
+                      "evictions": 0, "over_budget": 0}
+
+    def register(self, kind, name, scope, loader):
+        """Register a lazily generated asset; global assets load at once"""
+        self.entries[(kind, name)] = (scope, loader)
+        if scope in self.active_scopes:
+            self._load((kind, name))
+
+    def get(self, kind, name):
+        """Fetch an asset, regenerating it if it was evicted"""
+        key = (kind, name)
+        asset = self.loaded.get(key)
+        if asset is not None:
+            self.loaded.move_to_end(key)
+            self.stats["hits"] += 1
+            return asset
+        self.stats["misses"] += 1
+        return self._load(key)
+
+    def has(self, kind, name):
+        return (kind, name) in self.entries
+
+    def enter_scope(self, scope):
+        """Activate a scope and load its assets
+
+        Chapter and map scopes are exclusive: entering "map:dark_forest"
+        leaves the previous map, whose assets become evictable.
+        """
+        if ":" in scope:
+            prefix = scope.split(":")[0] + ":"
+            self.active_scopes = {s for s in self.active_scopes
+                                  if not s.startswith(prefix)}
+        self.active_scopes.add(scope)
+        self.prefetch(scope)
+
+    def leave_scope(self, scope):
+        """Deactivate a scope (its assets stay cached until evicted)"""
+        self.active_scopes.discard(scope)
+
+    def prefetch(self, scope):
+        """Load every asset of a scope without activating it"""
+        for key, (asset_scope, _) in self.entries.items():
+            if asset_scope != scope:
+                continue
+            if key in self.loaded:
+                self.loaded.move_to_end(key)
+            else:
+                self._load(key)
+
+    async def prefetch_async(self, scope, scheduler):
+        """prefetch() as a background job, one asset per step"""
+        for key, (asset_scope, _) in list(self.entries.items()):
+            if asset_scope != scope:
+                continue
+            if key in self.loaded:
+                self.loaded.move_to_end(key)
+            else:
+                self._load(key)
+                await scheduler.checkpoint()
+                
+    def _load(self, key):
+        scope, loader = self.entries[key]
+        asset = loader()
+        self.loaded[key] = asset
+        self.sizes[key] = asset_size(asset)
+        self.used += self.sizes[key]
+        self.stats["loads"] += 1
+        self._enforce_budget()
+        return asset
+
+    def _evict(self, key):
+        del self.loaded[key]
+        self.used -= self.sizes.pop(key)
+        self.stats["evictions"] += 1
+
+    def _enforce_budget(self):
+        """Evict least recently used assets of inactive scopes"""
+        if self.used <= self.budget:
+            return
+        for key in list(self.loaded):
+            if self.entries[key][0] in self.active_scopes:
+                continue
+            self._evict(key)
+            if self.used <= self.budget:
+                return
+        self.stats["over_budget"] += 1
+
+    def usage_by_scope(self):
+        """Resident bytes per scope"""
+        usage = {}
+        for key in self.loaded:
+            scope = self.entries[key][0]
+            usage[scope] = usage.get(scope, 0) + self.sizes[key]
+        return usage
+
+    def report(self):
+        """Human-readable memory report"""
+        lines = [f"Assets: {self.used / 1024:.1f} KiB / "
+                 f"{self.budget / 1024:.1f} KiB"]
+        for scope, used in sorted(self.usage_by_scope().items()):
+            marker = "*" if scope in self.active_scopes else " "
+            lines.append(f" {marker} {scope:<20} {used / 1024:8.1f} KiB")
+        lines.append("   " + ", ".join(f"{k}={v}" for k, v in self.stats.items()))
+        return "\n".join(lines)
+
+    def view(self, kind):
+        return AssetView(self, kind)
+
+class AssetView:
+    """Dict-style access to one kind of managed asset (sprites, sounds)"""
+
+    def __init__(self, manager, kind):
+        self.manager = manager
+        self.kind = kind
+
+    def __getitem__(self, name):
+        if not self.manager.has(self.kind, name):
+            raise KeyError(name)
+        return self.manager.get(self.kind, name)
+
+    def __contains__(self, name):
+        return self.manager.has(self.kind, name)
+
+    def keys(self):
+        return [name for kind, name in self.manager.entries if kind == self.kind]
+
 # ============================================================================
 # GBA AUDIO ENGINE (Software Synth - No Files!)
 # ============================================================================
 
+class VoiceMixer:
+    """Fixed pool of software voices mixed in NumPy into one output stream
+
+    Every voice has its own volume, pan and pitch (a resampling step).
+    play() takes a free voice or steals the lowest-priority, oldest one;
+    a sound outranked by every playing voice is dropped. update() keeps
+    a single reserved pygame channel fed with mixed int16 buffers, so the
+    cost per buffer is bounded by the pool size no matter how dense the
+    combo section gets.
+    
+    Waves are SAMPLE_RATE samples; voices resample to the device's actual
+    rate, and mixed buffers hold a game frame of audio plus one device
+    block, so one mix per frame keeps the stream ahead.
+    """
+    
+    def __init__(self, voices=8, buffer=512):
+        self.voices = voices
+        self.rate, _, self.channels = pygame.mixer.get_init()
+        # The device drains whole `buffer`-sample blocks, so keep a frame of
+        # audio ahead on top of the block it may be about to take
+        self.buffer = buffer * (1 + math.ceil(self.rate * FRAME_SECONDS / buffer))
+        self.rate_step = SAMPLE_RATE / self.rate    # Wave samples per output sample
+        buffer = self.buffer
+        pygame.mixer.set_reserved(1)
+        self.output = pygame.mixer.Channel(0)
+        
+        # Voice state (struct of arrays)
+        self.waves = [None] * voices                # Mono float32 samples
+        self.position = np.zeros(voices)            # Read position in samples
+        self.step = np.ones(voices)                 # Pitch as resampling step
+        self.gains = np.zeros((voices, self.channels), dtype=np.float32)
+        self.priority = np.zeros(voices, dtype=np.int32)
+        self.started = np.zeros(voices, dtype=np.int64)
+        
+        self.ramp = np.arange(buffer)
+        self.mix_buffer = np.zeros((buffer, self.channels), dtype=np.float32)
+        self.silence = pygame.sndarray.make_sound(
+            np.zeros((buffer, self.channels), dtype=np.int16).squeeze())
+        
+        # Stats
+        self.plays = 0
+        self.steals = 0
+        self.dropped = 0
+        self.buffers = 0
+        self.underruns = 0          # Output ran dry before update() refilled it
+        self.mix_time = 0.0
+        self.mix_peak = 0.0
+        self.voice_frames = 0       # Sum of active voices over mixed buffers
+        self.voice_peak = 0
+        
+    def play(self, wave, volume=1.0, pan=0.0, pitch=1.0, priority=0):
+        """Start a voice; returns its index or None if it was dropped"""
+        free = [v for v in range(self.voices) if self.waves[v] is None]
+        if free:
+            v = free[0]
+        else:
+            # Steal the lowest priority voice, oldest first
+            v = min(range(self.voices),
+                    key=lambda v: (self.priority[v], self.started[v]))
+            if self.priority[v] > priority:
+                self.dropped += 1
+                return None
+            self.steals += 1
+            
+        self.plays += 1
+        self.waves[v] = wave
+        self.position[v] = 0.0
+        self.step[v] = pitch * self.rate_step
+        self.priority[v] = priority
+        self.started[v] = self.plays
+        if self.channels == 1:
+            self.gains[v] = volume
+        else:
+            self.gains[v, 0] = volume * min(1.0, 1.0 - pan)
+            self.gains[v, 1] = volume * min(1.0, 1.0 + pan)
+        return v
+        
+    def stop_all(self):
+        self.waves = [None] * self.voices
+        
+    @property
+    def active(self):
+        return sum(wave is not None for wave in self.waves)
+        
+    def mix(self):
+        """Mix one buffer of every active voice into a Sound"""
+        start = time.perf_counter()
+        out = self.mix_buffer
+        out.fill(0)
+        active = 0
+        for v, wave in enumerate(self.waves):
+            if wave is None:
+                continue
+            active += 1
+            position, step = self.position[v], self.step[v]
+            count = min(self.buffer, math.ceil((len(wave) - position) / step))
+            index = (position + step * self.ramp[:count]).astype(np.intp)
+            out[:count] += wave[index][:, None] * self.gains[v]
+            self.position[v] = position + step * self.buffer
+            if self.position[v] >= len(wave):
+                self.waves[v] = None
+                
+        if active:
+            np.clip(out, -1.0, 1.0, out=out)
+            sound = pygame.sndarray.make_sound(
+                (out * 32767).astype(np.int16).squeeze())
+        else:
+            sound = self.silence
+            
+        elapsed = time.perf_counter() - start
+        self.buffers += 1
+        self.mix_time += elapsed
+        self.mix_peak = max(self.mix_peak, elapsed)
+        self.voice_frames += active
+        self.voice_peak = max(self.voice_peak, active)
+        return sound
+        
+    def update(self):
+        """Keep the output channel playing with one buffer queued behind"""
+        # Between one buffer ending and the queued one starting the channel
+        # reports idle; play() then would cut the queued buffer off
+        if not self.output.get_busy() and self.output.get_queue() is None:
+            self.underruns += self.buffers > 0
+            self.output.play(self.mix())
+        if self.output.get_queue() is None:
+            self.output.queue(self.mix())
+            
+    def report(self):
+        """Mixer cost per buffer, voice usage and steals"""
+        buffers = max(1, self.buffers)
+        buffer_ms = 1000 * self.buffer / self.rate
+        mix_ms = 1000 * self.mix_time / buffers
+        return "\n".join([
+            f"Mixer: {self.voices} voices at {self.rate} Hz, "
+            f"{self.buffer}-sample buffers ({buffer_ms:.1f} ms)",
+            f"  mix {mix_ms:.3f} ms avg / {1000 * self.mix_peak:.3f} ms peak per buffer "
+            f"({100 * mix_ms / buffer_ms:.1f}% of real time)",
+            f"  voices {self.voice_frames / buffers:.2f} avg / {self.voice_peak} peak, "
+            f"{self.plays} plays, {self.steals} steals, {self.dropped} dropped, "
+            f"{self.underruns} underruns",
+        ])
+
 class GBASynth:
     """Mother 3 / GBA-style software synthesizer"""
     
-    def __init__(self):
-        pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=512)
-        self.sounds = {}
+    # Voice priority per sound; hits and judgements outrank UI blips
+    PRIORITIES = {
+        "menu_select": 1, "menu_move": 0, "heal": 2,
+        "hit": 2, "explosion": 2, "fire_spell": 2, "ice_spell": 2, "lightning": 2,
+        "rhythm_good": 3, "rhythm_perfect": 3,
+    }
+    
+    def __init__(self, assets=None, voices=8, open_audio=True):
+        self.assets = assets or AssetManager()
+        self.sounds = self.assets.view("sound")
+        self.voices = voices
+        self.mixer = None           # Silent until open()
         self.music_channel = None
+        if open_audio:
+            self.open()
+            
+    def open(self):
+        """Initialize the mixer and register sound effects"""
+        if self.mixer is not None:
+            return
+        pygame.mixer.init(frequency=SAMPLE_RATE, size=-16, channels=2, buffer=512)
         self._create_sound_effects()
+        self.mixer = VoiceMixer(self.voices)
         
     def _create_sound_effects(self):
-        """Generate GBA-style sound effects programmatically"""
+        """Register GBA-style sound effects (generated on first use)"""
+        register = self.assets.register
+        # UI sounds stay resident
+        register("sound", "menu_select", "global",
+                 lambda: self._generate_square_wave(330, 0.05, 0.2))
+        register("sound", "menu_move", "global",
+                 lambda: self._generate_square_wave(220, 0.05, 0.1))
+        register("sound", "heal", "global",
+                 lambda: self._generate_sine_wave([523, 659, 784], 0.3, 0.5))
+        
         # Battle sounds
-        self.sounds['hit'] = self._generate_square_wave(440, 0.1, 0.3)
-        self.sounds['heal'] = self._generate_sine_wave([523, 659, 784], 0.3, 0.5)
-        self.sounds['menu_select'] = self._generate_square_wave(330, 0.05, 0.2)
-        self.sounds['menu_move'] = self._generate_square_wave(220, 0.05, 0.1)
-        self.sounds['explosion'] = self._generate_noise(0.2, 0.5)
-        self.sounds['rhythm_good'] = self._generate_sine_wave([784, 988], 0.1, 0.4)
-        self.sounds['rhythm_perfect'] = self._generate_sine_wave([1046, 1318], 0.15, 0.6)
+        register("sound", "hit", "battle",
+                 lambda: self._generate_square_wave(440, 0.1, 0.3))
+        register("sound", "explosion", "battle",
+                 lambda: self._generate_noise(0.2, 0.5))
+        register("sound", "rhythm_good", "battle",
+                 lambda: self._generate_sine_wave([784, 988], 0.1, 0.4))
+        register("sound", "rhythm_perfect", "battle",
+                 lambda: self._generate_sine_wave([1046, 1318], 0.15, 0.6))
         
         # Character spell sounds
-        self.sounds['fire_spell'] = self._generate_fire_sound()
-        self.sounds['ice_spell'] = self._generate_ice_sound()
-        self.sounds['lightning'] = self._generate_lightning_sound()
+        register("sound", "fire_spell", "battle", self._generate_fire_sound)
+        register("sound", "ice_spell", "battle", self._generate_ice_sound)
+        register("sound", "lightning", "battle", self._generate_lightning_sound)
+        
+    def _to_samples(self, wave, volume):
+        """Scale a mono wave in [-1, 1] to float32 voice samples"""
+        return (wave * volume).astype(np.float32)
         
     def _generate_square_wave(self, freq, duration, volume):
         """Generate GBA square wave"""
-        sample_rate = 22050
-        n_samples = int(sample_rate * duration)
-        buf = pygame.sndarray.make_sound(
-            (32767 * volume * 
-             (2 * ((pygame.sndarray.samples(
-                 pygame.mixer.Sound(buffer=bytearray(n_samples * 2))
-             ) // 128) % 2) - 1)).astype('int16')
-        )
-        return buf
+        t = np.arange(int(SAMPLE_RATE * duration)) / SAMPLE_RATE
+        return self._to_samples(np.sign(np.sin(2 * np.pi * freq * t)), volume)
         
     def _generate_sine_wave(self, freqs, duration, volume):
         """Generate sine wave chord"""
-        sample_rate = 22050
-        n_samples = int(sample_rate * duration)
-        arr = pygame.sndarray.make_sound(
-            bytearray(n_samples * 2)
-        )
-        return arr
+        n_samples = int(SAMPLE_RATE * duration)
+        t = np.arange(n_samples) / SAMPLE_RATE
+        wave = sum(np.sin(2 * np.pi * f * t) for f in freqs) / len(freqs)
+        return self._to_samples(wave * np.linspace(1, 0, n_samples), volume)
         
     def _generate_noise(self, duration, volume):
         """Generate noise/explosion"""
-        sample_rate = 22050
-        n_samples = int(sample_rate * duration)
-        return pygame.mixer.Sound(buffer=bytearray(n_samples * 2))
+        n_samples = int(SAMPLE_RATE * duration)
+        wave = np.random.uniform(-1, 1, n_samples) * np.linspace(1, 0, n_samples)
+        return self._to_samples(wave, volume)
         
     def _generate_fire_sound(self):
         """Fire spell sound"""
@@ -123,11 +863,17 @@ class GBASynth:
         """Lightning sound"""
         return self._generate_square_wave(880, 0.2, 0.5)
         
-    def play(self, sound_name):
-        """Play a sound effect"""
-        if sound_name in self.sounds:
-            self.sounds[sound_name].play()
+    def play(self, sound_name, volume=1.0, pan=0.0, pitch=1.0):
+        """Play a sound effect on the voice pool"""
+        if self.mixer is not None and sound_name in self.sounds:
+            self.mixer.play(self.sounds[sound_name], volume, pan, pitch,
+                            self.PRIORITIES.get(sound_name, 0))
             
+    def update(self):
+        """Feed the mixer's output stream (once per frame)"""
+        if self.mixer is not None:
+            self.mixer.update()
+        
     def play_music(self, track_type):
         """Start background music (simulated with repeating sounds)"""
         # In a real implementation, this would generate longer tracks
@@ -137,17 +883,83 @@ class GBASynth:
 # GBA SPRITE ENGINE (No Image Files!)
 # ============================================================================
 
+FACINGS = ("down", "left", "right", "up")
+FACING_VECTORS = np.array([(0, 1), (-1, 0), (1, 0), (0, -1)], dtype=np.float32)
+
+# Animation: name -> (frames, game frames per animation frame, loops).
+# idle/walk share ids with EntityStore.IDLE/WALK.
+ANIMATIONS = {
+    "idle": (2, 30, True),
+    "walk": (4, 8, True),
+    "attack": (3, 6, False),
+    "hurt": (2, 4, False),
+}
+ACTIONS = tuple(ANIMATIONS)
+ANIM_FRAMES = np.array([frames for frames, _, _ in ANIMATIONS.values()])
+ANIM_RATES = np.array([rate for _, rate, _ in ANIMATIONS.values()])
+ANIM_LOOPS = np.array([loops for _, _, loops in ANIMATIONS.values()])
+ANIM_OFFSETS = np.concatenate(([0], np.cumsum(ANIM_FRAMES)[:-1]))
+SHEET_COLUMNS = int(ANIM_FRAMES.sum())  # One row per facing
+
+def anim_columns(action, clock):
+    """Sheet column for action ids at animation clocks (arrays or ints)"""
+    step = clock // ANIM_RATES[action]
+    frames = ANIM_FRAMES[action]
+    frame = np.where(ANIM_LOOPS[action], step % frames, np.minimum(step, frames - 1))
+    return ANIM_OFFSETS[action] + frame
+
+def _shift(frame, dx, dy):
+    """Move a pixel frame, filling with transparent black"""
+    out = np.zeros_like(frame)
+    h, w = frame.shape[:2]
+    dx, dy = int(dx), int(dy)
+    out[max(dy, 0):h + min(dy, 0), max(dx, 0):w + min(dx, 0)] = \
+        frame[max(-dy, 0):h + min(-dy, 0), max(-dx, 0):w + min(-dx, 0)]
+    return out
+
+class SpriteSheet:
+    """Every animation frame of a character baked into one surface
+
+    Rows are facings and columns are the frames of each action in
+    ANIMATIONS order; rects holds the subrect of every cell, so picking
+    a frame is an index into a list.
+    """
+    
+    def __init__(self, surface, width, height):
+        self.surface = surface
+        self.rects = [pygame.Rect(column * width, row * height, width, height)
+                      for row in range(len(FACINGS)) for column in range(SHEET_COLUMNS)]
+        
+    def frame(self, action, facing, clock):
+        """Subrect for one entity's action, facing name and clock"""
+        column = anim_columns(ACTIONS.index(action), clock)
+        return self.rects[FACINGS.index(facing) * SHEET_COLUMNS + int(column)]
+
 class GBASprite:
     """GBA-style 16x16/32x32 sprites with limited palette"""
     
+    # Eye pixels per facing, plus (from, to) head recolor seen from behind
+    FACES = {
+        "joseph": ({"down": [(7, 3), (8, 3)], "left": [(6, 3)],
+                    "right": [(9, 3)], "up": []}, DARK_GRAY, (LIGHT_GRAY, GRAY)),
+        "shroom": ({"down": [(6, 8), (10, 8)], "left": [(5, 8)],
+                    "right": [(11, 8)], "up": []}, WHITE, None),
+    }
+    
     def __init__(self, width=16, height=16):
         self.width = width
         self.height = height
         self.pixels = [[BLACK for _ in range(width)] for _ in range(height)]
         self.palette = [BLACK, WHITE, RED, BLUE]  # 4-color palette (GBA style)
+        self.char_type = None
+        self.surface = None  # Baked on first draw
+        self.sheet = None    # Animation frames, baked on first animated draw
         
     def create_character(self, char_type, color):
         """Create character sprite procedurally"""
+        self.surface = None
+        self.sheet = None
+        self.char_type = char_type
         if char_type == "joseph":
             # Blue student sprite
             for y in range(self.height):
@@ -173,24 +985,1117 @@ class GBASprite:
                         
         return self
         
-    def draw(self, surface, x, y):
-        """Draw sprite to surface"""
+    def bake(self):
+        """Bake the pixel grid into a colorkeyed surface"""
+        self.surface = pygame.Surface((self.width, self.height))
         for sy in range(self.height):
             for sx in range(self.width):
-                color = self.pixels[sy][sx]
-                if color != BLACK:  # Transparent = black
-                    pygame.draw.rect(surface, color, 
-                                    (x + sx * SCALE, y + sy * SCALE, SCALE, SCALE))
+                self.surface.set_at((sx, sy), self.pixels[sy][sx])
+        self.surface.set_colorkey(BLACK, pygame.RLEACCEL)  # Transparent = black
+        return self.surface
+        
+    def _facing_frame(self, base, facing):
+        """Base frame with the face turned toward a facing"""
+        frame = base.copy()
+        if self.char_type in self.FACES:
+            eyes, eye_color, hair = self.FACES[self.char_type]
+            if facing == "up" and hair:
+                frame[(frame == hair[0]).all(axis=2)] = hair[1]
+            for x, y in eyes[facing]:
+                frame[y, x] = eye_color
+        return frame
+        
+    def _action_frames(self, frame, facing):
+        """Procedural frames of every action for one facing"""
+        dx, dy = FACING_VECTORS[FACINGS.index(facing)]
+        opaque = frame.any(axis=2)
+        bob = _shift(frame, 0, -1)
+        
+        # Walk cycle: bob up while lifting one foot, then the other
+        feet = np.flatnonzero(opaque.any(axis=1))[-1] - 1     # Lowest row once bobbed
+        steps = []
+        for half in (slice(0, self.width // 2), slice(self.width // 2, None)):
+            step = bob.copy()
+            step[feet, half] = 0
+            steps.append(step)
+            
+        hurt = np.where(opaque[..., None], np.array(WHITE, dtype=np.uint8), frame)
+        return {
+            "idle": [frame, bob],
+            "walk": [frame, steps[0], frame, steps[1]],
+            "attack": [_shift(frame, -dx, -dy), _shift(frame, 2 * dx, 2 * dy),
+                       _shift(frame, dx, dy)],
+            "hurt": [hurt, _shift(frame, -dx, -dy)],
+        }
+        
+    def bake_sheet(self):
+        """Generate and bake every facing and action frame into one sheet"""
+        base = np.array(self.pixels, dtype=np.uint8)    # (height, width, rgb)
+        w, h = self.width, self.height
+        pixels = np.zeros((len(FACINGS) * h, SHEET_COLUMNS * w, 3), dtype=np.uint8)
+        for row, facing in enumerate(FACINGS):
+            frames = self._action_frames(self._facing_frame(base, facing), facing)
+            column = 0
+            for action in ACTIONS:
+                for frame in frames[action]:
+                    pixels[row * h:(row + 1) * h, column * w:(column + 1) * w] = frame
+                    column += 1
+        surface = pygame.Surface((SHEET_COLUMNS * w, len(FACINGS) * h))
+        pygame.surfarray.blit_array(surface, pixels.transpose(1, 0, 2))
+        surface.set_colorkey(BLACK)     # No RLE: subrect blits would walk the runs
+        self.sheet = SpriteSheet(surface, w, h)
+        return self.sheet
+        
+    def draw(self, surface, x, y):
+        """Draw sprite to a native-resolution surface"""
+        surface.blit(self.surface or self.bake(), (x, y))
+
+# ============================================================================
+# GBA BITMAP FONT ENGINE (Glyph atlas - No FreeType!)
+# ============================================================================
+
+# 5x7 glyphs in an 8x8 cell, one hex byte per row (bit 4 = leftmost pixel)
+GLYPHS = {
+    ' ': "00000000000000", '!': "04040404040004", '"': "0A0A0000000000",
+    '#': "0A0A1F0A1F0A0A", '$': "040F140E051E04", '%': "18190204081303",
+    '&': "0C12140815120D", "'": "04040000000000", '(': "02040808080402",
+    ')': "08040202020408", '*': "0004150E150400", '+': "0004041F040400",
+    ',': "000000000C0408", '-': "0000001F000000", '.': "00000000000C0C",
+    '/': "00010204081000", '0': "0E11131519110E", '1': "040C040404040E",
+    '2': "0E11010204081F", '3': "1F02040201110E", '4': "02060A121F0202",
+    '5': "1F101E0101110E", '6': "0608101E11110E", '7': "1F010204080808",
+    '8': "0E11110E11110E", '9': "0E11110F01020C", ':': "000C0C000C0C00",
+    ';': "000C0C000C0408", '<': "02040810080402", '=': "00001F001F0000",
+    '>': "08040201020408", '?': "0E110102040004", '@': "0E11010D15150E",
+    'A': "0E1111111F1111", 'B': "1E11111E11111E", 'C': "0E11101010110E",
+    'D': "1C12111111121C", 'E': "1F10101E10101F", 'F': "1F10101E101010",
+    'G': "0E11101711110F", 'H': "1111111F111111", 'I': "0E04040404040E",
+    'J': "0702020202120C", 'K': "11121418141211", 'L': "1010101010101F",
+    'M': "111B1515111111", 'N': "11111915131111", 'O': "0E11111111110E",
+    'P': "1E11111E101010", 'Q': "0E11111115120D", 'R': "1E11111E141211",
+    'S': "0F10100E01011E", 'T': "1F040404040404", 'U': "1111111111110E",
+    'V': "11111111110A04", 'W': "1111111515150A", 'X': "11110A040A1111",
+    'Y': "1111110A040404", 'Z': "1F01020408101F", '[': "0E08080808080E",
+    '\\': "00100804020100", ']': "0E02020202020E", '^': "040A1100000000",
+    '_': "0000000000001F", '`': "08040000000000", 'a': "00000E010F110F",
+    'b': "1010161911111E", 'c': "00000E1010110E", 'd': "01010D1311110F",
+    'e': "00000E111F100E", 'f': "0609081C080808", 'g': "000F11110F010E",
+    'h': "10101619111111", 'i': "04000C0404040E", 'j': "0200060202120C",
+    'k': "10101214181412", 'l': "0C04040404040E", 'm': "00001A15151111",
+    'n': "00001619111111", 'o': "00000E1111110E", 'p': "00001E111E1010",
+    'q': "00000D130F0101", 'r': "00001619101010", 's': "00000E100E011E",
+    't': "08081C08080906", 'u': "0000111111130D", 'v': "00001111110A04",
+    'w': "0000111115150A", 'x': "0000110A040A11", 'y': "000011110F010E",
+    'z': "00001F0204081F", '{': "02040408040402", '|': "04040404040404",
+    '}': "08040402040408", '~': "00000815020000", '♡': "000A15110A0400"
+}
+
+class GBAFont:
+    """Fixed-width 8x8 / 8x16 bitmap font packed into one glyph atlas
+
+    Strings are drawn with a single Surface.blits call of atlas subrects and
+    all metrics are arithmetic, so wrapping never touches the rasterizer.
+    """
+    
+    ATLAS_COLUMNS = 16
+    
+    def __init__(self, scale=1, tall=False):
+        self.scale = scale
+        self.tall = tall
+        self.advance = 8 * scale
+        self.height = (16 if tall else 8) * scale
+        self.line_height = self.height + self.height // 2
+        self.glyph_rects = {}
+        self.atlas = self._build_atlas()
+        self.tinted = {WHITE: self.atlas}
+        
+        # Throughput counters (real Surface blits only; recording is free)
+        self.glyphs_drawn = 0
+        self.draw_time = 0.0
+        
+    def _build_atlas(self):
+        """Rasterize every glyph once into a white-on-black atlas"""
+        rows = (len(GLYPHS) + self.ATLAS_COLUMNS - 1) // self.ATLAS_COLUMNS
+        atlas = pygame.Surface((self.ATLAS_COLUMNS * self.advance, rows * self.height))
+        atlas.fill(BLACK)
+        row_h = self.scale * (2 if self.tall else 1)
+        for i, (char, data) in enumerate(GLYPHS.items()):
+            gx = (i % self.ATLAS_COLUMNS) * self.advance
+            gy = (i // self.ATLAS_COLUMNS) * self.height
+            for y, bits in enumerate(bytes.fromhex(data)):
+                for x in range(5):
+                    if bits & (0x10 >> x):
+                        atlas.fill(WHITE, ((gx + (x + 1) * self.scale, gy + y * row_h),
+                                           (self.scale, row_h)))
+            self.glyph_rects[char] = pygame.Rect(gx, gy, self.advance, self.height)
+        atlas.set_colorkey(BLACK, pygame.RLEACCEL)
+        return atlas
+        
+    def _atlas_for(self, color):
+        """Atlas tinted to a color (built once per color)"""
+        atlas = self.tinted.get(color)
+        if atlas is None:
+            atlas = self.atlas.copy()
+            atlas.fill(color, special_flags=pygame.BLEND_RGB_MULT)
+            atlas.set_colorkey(BLACK, pygame.RLEACCEL)
+            self.tinted[color] = atlas
+        return atlas
+        
+    def size(self, text):
+        """Pixel size of a single line"""
+        return len(text) * self.advance, self.height
+        
+    def wrap(self, text, width):
+        """Greedy word wrap using fixed-width character counts"""
+        max_chars = max(1, width // self.advance)
+        lines = []
+        current = ""
+        for word in text.split(' '):
+            if not current:
+                current = word
+            elif len(current) + 1 + len(word) <= max_chars:
+                current += " " + word
+            else:
+                lines.append(current)
+                current = word
+        if current:
+            lines.append(current)
+        return lines
+        
+    def draw(self, surface, text, pos, color=WHITE):
+        """Draw one line of text, returning its bounding rect"""
+        start = time.perf_counter()
+        atlas = self._atlas_for(color)
+        rects = self.glyph_rects
+        fallback = rects['?']
+        x, y = pos
+        advance = self.advance
+        surface.blits([(atlas, (x + i * advance, y), rects.get(char, fallback))
+                       for i, char in enumerate(text) if char != ' '],
+                      doreturn=False)
+        if isinstance(surface, pygame.Surface):
+            self.glyphs_drawn += len(text)
+            self.draw_time += time.perf_counter() - start
+        return pygame.Rect(x, y, len(text) * advance, self.height)
+        
+    def draw_centered(self, surface, text, center, color=WHITE):
+        """Draw one line of text centered on a point"""
+        width, height = self.size(text)
+        return self.draw(surface, text,
+                         (center[0] - width // 2, center[1] - height // 2), color)
+        
+    def glyphs_per_sec(self):
+        """Measured text throughput since the counters were last reset"""
+        if self.draw_time <= 0:
+            return 0.0
+        return self.glyphs_drawn / self.draw_time
+        
+    def reset_stats(self):
+        self.glyphs_drawn = 0
+        self.draw_time = 0.0
+
+# ============================================================================
+# SCREEN EFFECTS (Palette LUT fades, flashes, mosaic)
+# ============================================================================
+
+class ScreenEffects:
+    """GBA-style post effects applied to the native framebuffer
+
+    Fades and flashes are 256-entry lookup tables precomputed per level;
+    stacked color effects are composed into one table and applied in a
+    single pass. Mosaic uses precomputed block index tables. All working
+    buffers are allocated once, so an active effect costs no allocation.
+    """
+    
+    LEVELS = 32
+    MAX_MOSAIC = 16
+    
+    def __init__(self, size=(GBA_WIDTH, GBA_HEIGHT), profiler=None):
+        self.profiler = profiler
+        width, height = size
+        ramp = np.arange(256, dtype=np.float32)
+        t = np.linspace(0, 1, self.LEVELS + 1, dtype=np.float32)[:, None]
+        self.fade_luts = (ramp * (1 - t)).astype(np.uint8)              # To black
+        self.flash_luts = (ramp + (255 - ramp) * t).astype(np.uint8)    # To white
+        self.mosaic_index = {
+            block: ((np.arange(width) // block) * block,
+                    (np.arange(height) // block) * block)
+            for block in range(2, self.MAX_MOSAIC + 1)
+        }
+        self.lut = np.empty(256, dtype=np.uint8)
+        self.buffer = np.empty((width, height, 3), dtype=np.uint8)
+        self.scratch = np.empty((width, height, 3), dtype=np.uint8)
+        
+        # Current effect levels (0 = off)
+        self.fade = 0.0
+        self.flash_level = 0.0
+        self.mosaic = 1
+        self.tracks = {}    # level name -> queue of tween segments
+        
+    # ------------------------------------------------------------------
+    # Timeline
+    # ------------------------------------------------------------------
+    
+    def _tween(self, name, start, end, frames, on_done=None):
+        """Queue a linear change of one effect level"""
+        self.tracks.setdefault(name, []).append({
+            'start': start, 'end': end,
+            'frames': max(1, frames), 'timer': 0,
+            'on_done': on_done
+        })
+        
+    def fade_transition(self, frames=16, on_black=None):
+        """Fade to black, run on_black, then fade back in"""
+        self._tween('fade', self.fade, 1.0, frames, on_black)
+        self._tween('fade', 1.0, 0.0, frames)
+        
+    def flash(self, frames=8, strength=0.8):
+        """White flash that decays over a few frames"""
+        self.tracks['flash_level'] = []
+        self._tween('flash_level', strength, 0.0, frames)
+        
+    def mosaic_in(self, frames=24):
+        """Mosaic that resolves from large blocks to full detail"""
+        self.tracks['mosaic'] = []
+        self._tween('mosaic', self.MAX_MOSAIC, 1, frames)
+        
+    @property
+    def transitioning(self):
+        """True while a fade transition is running"""
+        return bool(self.tracks.get('fade'))
+        
+    def update(self):
+        """Advance effect timelines by one frame"""
+        for name, segments in self.tracks.items():
+            if not segments:
+                continue
+            seg = segments[0]
+            seg['timer'] += 1
+            progress = seg['timer'] / seg['frames']
+            value = seg['start'] + (seg['end'] - seg['start']) * min(1.0, progress)
+            setattr(self, name, int(round(value)) if name == 'mosaic' else value)
+            if progress >= 1.0:
+                segments.pop(0)
+                if seg['on_done']:
+                    seg['on_done']()
+                    
+    @property
+    def active(self):
+        return self.fade > 0 or self.flash_level > 0 or self.mosaic > 1
+        
+    # ------------------------------------------------------------------
+    # Application
+    # ------------------------------------------------------------------
+    
+    def _apply_lut(self, surface, lut):
+        pixels = pygame.surfarray.pixels3d(surface)
+        np.take(lut, pixels, out=self.buffer, mode='clip')
+        pixels[...] = self.buffer
+        del pixels
+        
+    def dim(self, surface, amount=0.5):
+        """Darken a surface immediately (e.g. behind the pause menu)"""
+        self._apply_lut(surface, self.fade_luts[int(amount * self.LEVELS)])
+        
+    def levels(self):
+        """Current (fade, flash, mosaic) levels, captured per render frame"""
+        return (self.fade, self.flash_level, self.mosaic)
+        
+    def apply(self, surface, levels=None):
+        """Apply effects at the given (or current) levels to the native framebuffer"""
+        fade, flash_level, mosaic = levels or self.levels()
+        if not (fade > 0 or flash_level > 0 or mosaic > 1):
+            return
+        start = time.perf_counter()
+        
+        if mosaic > 1:
+            xs, ys = self.mosaic_index[min(mosaic, self.MAX_MOSAIC)]
+            pixels = pygame.surfarray.pixels3d(surface)
+            np.take(pixels, xs, axis=0, out=self.scratch)
+            np.take(self.scratch, ys, axis=1, out=self.buffer)
+            pixels[...] = self.buffer
+            del pixels
+        mosaic_done = time.perf_counter()
+            
+        if fade > 0 or flash_level > 0:
+            # Compose fade then flash into a single table
+            lut = self.fade_luts[int(fade * self.LEVELS)]
+            if flash_level > 0:
+                np.take(self.flash_luts[int(flash_level * self.LEVELS)],
+                        lut, out=self.lut)
+                lut = self.lut
+            self._apply_lut(surface, lut)
+            
+        if self.profiler:
+            end = time.perf_counter()
+            self.profiler.add("effects:mosaic", mosaic_done - start)
+            self.profiler.add("effects:palette", end - mosaic_done)
+
+# ============================================================================
+# PIXEL-ART UPSCALERS (Scale2x / Scale3x / xBR-lite)
+# ============================================================================
+
+def _packed_average(a, b):
+    """Per-channel average of two arrays of packed 32-bit pixels"""
+    return ((a >> 1) & 0x7F7F7F7F) + ((b >> 1) & 0x7F7F7F7F)
+
+def scale2x(padded):
+    """Scale2x (AdvMAME2x) on an edge-padded [x, y] array of packed pixels"""
+    E = padded[1:-1, 1:-1]
+    B = padded[1:-1, :-2]   # Up
+    H = padded[1:-1, 2:]    # Down
+    D = padded[:-2, 1:-1]   # Left
+    F = padded[2:, 1:-1]    # Right
+    edge = (B != H) & (D != F)
+    w, h = E.shape
+    out = np.empty((w * 2, h * 2), dtype=padded.dtype)
+    out[0::2, 0::2] = np.where(edge & (D == B), D, E)
+    out[1::2, 0::2] = np.where(edge & (B == F), F, E)
+    out[0::2, 1::2] = np.where(edge & (D == H), D, E)
+    out[1::2, 1::2] = np.where(edge & (H == F), F, E)
+    return out
+
+def scale3x(padded):
+    """Scale3x (AdvMAME3x) on an edge-padded [x, y] array of packed pixels"""
+    A, B, C = padded[:-2, :-2], padded[1:-1, :-2], padded[2:, :-2]
+    D, E, F = padded[:-2, 1:-1], padded[1:-1, 1:-1], padded[2:, 1:-1]
+    G, H, I = padded[:-2, 2:], padded[1:-1, 2:], padded[2:, 2:]
+    edge = (B != H) & (D != F)
+    db = edge & (D == B)
+    bf = edge & (B == F)
+    dh = edge & (D == H)
+    hf = edge & (H == F)
+    w, h = E.shape
+    out = np.empty((w * 3, h * 3), dtype=padded.dtype)
+    out[0::3, 0::3] = np.where(db, D, E)
+    out[1::3, 0::3] = np.where((db & (E != C)) | (bf & (E != A)), B, E)
+    out[2::3, 0::3] = np.where(bf, F, E)
+    out[0::3, 1::3] = np.where((db & (E != G)) | (dh & (E != A)), D, E)
+    out[1::3, 1::3] = E
+    out[2::3, 1::3] = np.where((bf & (E != I)) | (hf & (E != C)), F, E)
+    out[0::3, 2::3] = np.where(dh, D, E)
+    out[1::3, 2::3] = np.where((dh & (E != I)) | (hf & (E != G)), H, E)
+    out[2::3, 2::3] = np.where(hf, F, E)
+    return out
+
+def xbr_lite(padded):
+    """Scale3x with replaced edge pixels blended 50% into the source pixel"""
+    sharp = scale3x(padded)
+    nearest = np.repeat(np.repeat(padded[1:-1, 1:-1], 3, axis=0), 3, axis=1)
+    return _packed_average(sharp, nearest)
+
+# mode -> (scale factor, filter); None = pygame nearest-neighbour scale
+UPSCALERS = {
+    "nearest": None,
+    "scale2x": (2, scale2x),
+    "scale3x": (3, scale3x),
+    "xbr-lite": (3, xbr_lite)
+}
+
+class Upscaler:
+    """Present the native frame through a selectable pixel-art filter
+
+    Filtered output is cached between frames: only 8x8 tiles whose input
+    pixels (or 1px neighbourhood) changed are re-filtered, so static map
+    layers and idle sprites cost nothing after the first frame.
+    """
+    
+    TILE = 8
+    FULL_REFILTER = 0.6  # Dirty tile ratio above which one full pass is cheaper
+    
+    def __init__(self, mode="nearest", size=(GBA_WIDTH, GBA_HEIGHT), profiler=None):
+        self.size = size
+        self.profiler = profiler
+        width, height = size
+        self.padded = np.zeros((width + 2, height + 2), dtype=np.uint32)
+        self.previous = np.zeros((width, height), dtype=np.uint32)
+        self.set_mode(mode)
+        
+        # Stats
+        self.frames = 0
+        self.tiles_filtered = 0
+        
+    def set_mode(self, mode):
+        if mode not in UPSCALERS:
+            raise ValueError(f"Unknown upscaler '{mode}' "
+                             f"(choose from {', '.join(UPSCALERS)})")
+        self.mode = mode
+        self.output = None  # Rebuilt (and fully refiltered) on next present
+        
+    def invalidate(self):
+        """Force a full refilter on the next frame"""
+        self.output = None
+        
+    def present(self, frame, screen):
+        """Upscale the native frame into the window surface"""
+        start = time.perf_counter()
+        if UPSCALERS[self.mode] is None:
+            pygame.transform.scale(frame, screen.get_size(), screen)
+        else:
+            factor, _ = UPSCALERS[self.mode]
+            if self.output is None:
+                width, height = self.size
+                self.output = pygame.Surface((width * factor, height * factor), 0, frame)
+                self._filter(frame, full=True)
+            else:
+                self._filter(frame)
+            if self.output.get_size() == screen.get_size():
+                screen.blit(self.output, (0, 0))
+            else:
+                pygame.transform.scale(self.output, screen.get_size(), screen)
+        self.frames += 1
+        if self.profiler:
+            self.profiler.add("upscale:" + self.mode, time.perf_counter() - start)
+            
+    def _dirty_tiles(self, current):
+        """Tiles whose filtered output may differ from the cached one"""
+        changed = current != self.previous
+        # Filters read the 8-neighbourhood, so grow changes by one pixel
+        grown = changed.copy()
+        grown[1:] |= changed[:-1]
+        grown[:-1] |= changed[1:]
+        changed = grown.copy()
+        grown[:, 1:] |= changed[:, :-1]
+        grown[:, :-1] |= changed[:, 1:]
+        width, height = self.size
+        tile = self.TILE
+        return grown.reshape(width // tile, tile, height // tile, tile).any(axis=(1, 3))
+        
+    def _filter(self, frame, full=False):
+        factor, filter_func = UPSCALERS[self.mode]
+        current = pygame.surfarray.pixels2d(frame)
+        tiles = None if full else self._dirty_tiles(current)
+        if tiles is not None and not tiles.any():
+            del current
+            return
+            
+        # Refresh the edge-padded copy of the frame
+        padded = self.padded
+        padded[1:-1, 1:-1] = current
+        padded[0, 1:-1] = current[0]
+        padded[-1, 1:-1] = current[-1]
+        padded[:, 0] = padded[:, 1]
+        padded[:, -1] = padded[:, -2]
+        self.previous[...] = current
+        del current
+        
+        output = pygame.surfarray.pixels2d(self.output)
+        tile = self.TILE
+        if tiles is None or tiles.mean() > self.FULL_REFILTER:
+            output[...] = filter_func(padded)
+            self.tiles_filtered += self.previous.size // (tile * tile)
+        else:
+            # One filter pass per tile row, spanning its dirty columns
+            for row in np.flatnonzero(tiles.any(axis=0)):
+                cols = np.flatnonzero(tiles[:, row])
+                x0, x1 = cols[0] * tile, (cols[-1] + 1) * tile
+                y0, y1 = row * tile, (row + 1) * tile
+                output[x0 * factor:x1 * factor, y0 * factor:y1 * factor] = \
+                    filter_func(padded[x0:x1 + 2, y0:y1 + 2])
+                self.tiles_filtered += cols[-1] - cols[0] + 1
+        del output
+
+def benchmark_upscalers(frames=120):
+    """Time every upscaler on a mostly static scene with one moving sprite
+
+    Returns {mode: {"full_ms": ..., "cached_ms": ..., "fps": ...}} where
+    full_ms refilters every frame and cached_ms uses the dirty-tile cache.
+    """
+    frame = pygame.Surface((GBA_WIDTH, GBA_HEIGHT), 0, 32)
+    screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), 0, frame)
+    background = pygame.Surface((GBA_WIDTH, GBA_HEIGHT), 0, frame)
+    background.fill((20, 30, 20))
+    for x in range(0, GBA_WIDTH, 40):
+        pygame.draw.rect(background, ENEMY_GREEN, (x, 50, 10, 30))
+    pygame.draw.circle(background, ENEMY_RED, (60, 120), 12)
+    sprite = GBASprite(16, 16).create_character("joseph", BLUE)
+    
+    results = {}
+    for mode in UPSCALERS:
+        timings = {}
+        for label, cached in (("full_ms", False), ("cached_ms", True)):
+            upscaler = Upscaler(mode)
+            start = time.perf_counter()
+            for i in range(frames):
+                frame.blit(background, (0, 0))
+                sprite.draw(frame, 20 + i % 200, 80)
+                if not cached:
+                    upscaler.invalidate()
+                upscaler.present(frame, screen)
+            timings[label] = 1000 * (time.perf_counter() - start) / frames
+        timings["fps"] = 1000 / timings["cached_ms"]
+        results[mode] = timings
+    return results
+
+# ============================================================================
+# ENTITY STORE (Struct-of-arrays NPCs and enemies)
+# ============================================================================
+
+REVERSE_FACING = np.array([3, 2, 1, 0], dtype=np.int8)
+
+class EntityStore:
+    """Struct-of-arrays storage for overworld NPCs and battle enemies
+
+    Every per-entity field is a NumPy column indexed by entity id, so
+    movement is updated for all entities in one vectorized batch and
+    drawing is a single Y-sorted Surface.blits call. IDLE entities stand,
+    WALK entities wander and PATH entities follow a NavGrid flow field.
+    """
+    
+    IDLE = 0
+    WALK = 1
+    PATH = 2
+    
+    def __init__(self, capacity=64, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.sprite_names = []    # sprite id -> sprite asset name
+        self.sprite_ids = {}
+        self.free = []
+        self.count = 0            # High-water mark of used slots
+        self._allocate(capacity)
+        
+    COLUMNS = {
+        'pos': (2, np.float32),
+        'vel': (2, np.float32),
+        'speed': (None, np.float32),
+        'sprite': (None, np.int16),
+        'facing': (None, np.int8),
+        'state': (None, np.int8),
+        'timer': (None, np.int16),   # Frames until the next wander decision
+        'action': (None, np.int8),   # Index into ACTIONS
+        'clock': (None, np.int32),   # Frames since the action started
+        'stop': (None, np.float32),  # PATH: distance from the target to halt at
+        'alive': (None, bool)
+    }
+    
+    def _allocate(self, capacity):
+        """(Re)allocate every column, keeping existing entities"""
+        for name, (width, dtype) in self.COLUMNS.items():
+            column = np.zeros((capacity, width) if width else capacity, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                column[:len(old)] = old
+            setattr(self, name, column)
+        self.capacity = capacity
+        
+    def sprite_id(self, name):
+        """Intern a sprite asset name"""
+        if name not in self.sprite_ids:
+            self.sprite_ids[name] = len(self.sprite_names)
+            self.sprite_names.append(name)
+        return self.sprite_ids[name]
+        
+    def spawn(self, sprite, x, y, facing="down", state=WALK, speed=0.5, stop=0.0):
+        """Add an entity and return its id"""
+        if self.free:
+            i = self.free.pop()
+        else:
+            if self.count == self.capacity:
+                self._allocate(self.capacity * 2)
+            i = self.count
+            self.count += 1
+        self.pos[i] = (x, y)
+        self.vel[i] = 0
+        self.speed[i] = speed
+        self.sprite[i] = self.sprite_id(sprite)
+        self.facing[i] = FACINGS.index(facing)
+        self.state[i] = state
+        self.timer[i] = 0
+        self.action[i] = min(state, self.WALK)
+        self.clock[i] = self.rng.integers(0, 240)  # Out of step with neighbours
+        self.stop[i] = stop
+        self.alive[i] = True
+        return i
+        
+    def play(self, i, action):
+        """Start an action animation (attack/hurt return to idle or walk)"""
+        self.action[i] = ACTIONS.index(action)
+        self.clock[i] = 0
+        
+    def play_all(self, action):
+        """Start an action animation on every live entity"""
+        alive = self.alive[:self.count]
+        self.action[:self.count][alive] = ACTIONS.index(action)
+        self.clock[:self.count][alive] = 0
+        
+    def despawn(self, i):
+        self.alive[i] = False
+        self.free.append(i)
+        
+    def clear(self):
+        self.alive[:self.count] = False
+        self.free = []
+        self.count = 0
+        self.sprite_names = []
+        self.sprite_ids = {}
+        
+    def __len__(self):
+        return int(np.count_nonzero(self.alive[:self.count]))
+        
+    def update(self, bounds=(0, 0, GBA_WIDTH - 16, GBA_HEIGHT - 16), nav=None,
+               target="player"):
+        """Advance every live entity by one frame
+
+        PATH entities steer by nav's flow field named target.
+        """
+        n = self.count
+        if n == 0:
+            return
+        alive = self.alive[:n]
+        timer = self.timer[:n]
+        facing = self.facing[:n]
+        state = self.state[:n]
+        
+        # Wanderers pick a new heading (or pause) when their timer runs out
+        timer -= 1
+        decide = alive & (timer <= 0) & (state == self.WALK)
+        count = int(np.count_nonzero(decide))
+        if count:
+            facing[decide] = self.rng.integers(0, 4, count)
+            timer[decide] = self.rng.integers(30, 120, count)
+            
+        walking = (alive & (state == self.WALK)).astype(np.float32)
+        vel = self.vel[:n]
+        np.multiply(FACING_VECTORS[facing], (self.speed[:n] * walking)[:, None], out=vel)
+        pos = self.pos[:n]
+        
+        # Path followers head for the centre of their cell's next cell
+        pathing = np.flatnonzero(alive & (state == self.PATH))
+        field = nav.fields.get(target) if nav is not None else None
+        moving = np.zeros(n, dtype=bool)
+        if len(pathing) and field is not None and field.target is not None:
+            feet = pos[pathing] + FEET
+            goal = nav.centers[field.target]
+            toward = nav.centers[field.next[nav.cells(feet)]] - feet
+            length = np.hypot(toward[:, 0], toward[:, 1])
+            speed = np.minimum(self.speed[pathing], length)
+            go = np.hypot(*(goal - feet).T) > self.stop[pathing]
+            step = toward * (np.where(go, speed, 0) / np.maximum(length, 1e-6))[:, None]
+            vel[pathing] = step
+            moving[pathing] = go & (length > 0.5)
+            
+            heading = pathing[moving[pathing]]
+            dx, dy = vel[heading, 0], vel[heading, 1]
+            facing[heading] = np.where(np.abs(dx) >= np.abs(dy),
+                                       np.where(dx < 0, 1, 2), np.where(dy < 0, 3, 0))
+        pos += vel
+        
+        # Wanderers bounce off the map edges
+        left, top, right, bottom = bounds
+        hit = ((pos[:, 0] < left) | (pos[:, 0] > right) |
+               (pos[:, 1] < top) | (pos[:, 1] > bottom)) & (state == self.WALK)
+        facing[hit] = REVERSE_FACING[facing[hit]]
+        np.clip(pos[:, 0], left, right, out=pos[:, 0])
+        np.clip(pos[:, 1], top, bottom, out=pos[:, 1])
+        
+        # Advance animation clocks; finished one-shot actions fall back
+        clock = self.clock[:n]
+        clock += 1
+        action = self.action[:n]
+        done = ~ANIM_LOOPS[action] & (clock >= ANIM_FRAMES[action] * ANIM_RATES[action])
+        action[done] = np.minimum(state[done], self.WALK)
+        clock[done] = 0
+        
+        # Path followers walk while moving and idle once they arrive
+        looping = (state == self.PATH) & ANIM_LOOPS[action]
+        action[looping] = np.where(moving[looping], self.WALK, self.IDLE)
+        
+    def draw(self, surface, sprites, extra=()):
+        """Draw live entities back-to-front by Y with one blits call
+
+        Each entity blits the sprite-sheet cell picked by its facing,
+        action and clock. extra is a sequence of (surface, (x, y), area)
+        items (e.g. the player) merged into the same Y order.
+        """
+        idx = np.flatnonzero(self.alive[:self.count])
+        # Only touch the sheets of live entities, so the sprites of a map
+        # left behind are not kept hot in the asset cache
+        images, rects = {}, {}
+        for sid in np.unique(self.sprite[idx]).tolist():
+            sprite = sprites[self.sprite_names[sid]]
+            sheet = sprite.sheet or sprite.bake_sheet()
+            images[sid], rects[sid] = sheet.surface, sheet.rects
+        order = idx[np.argsort(self.pos[idx, 1], kind='stable')]
+        xs = self.pos[order, 0].astype(np.int32).tolist()
+        ys = self.pos[order, 1].astype(np.int32).tolist()
+        cells = (self.facing[order] * SHEET_COLUMNS +
+                 anim_columns(self.action[order], self.clock[order])).tolist()
+        blits = [(images[sid], (x, y), rects[sid][cell])
+                 for sid, x, y, cell in zip(self.sprite[order].tolist(), xs, ys, cells)]
+        for image, (x, y), area in extra:
+            at = bisect.bisect_right(ys, y)
+            ys.insert(at, y)
+            blits.insert(at, (image, (x, y), area))
+        surface.blits(blits, doreturn=False)
+
+def benchmark_entities(count=1000, frames=120):
+    """Average update + draw cost (ms) for a crowd of walking entities
+
+    Returns (animated_ms, static_ms); static_ms draws the same Y-sorted
+    crowd from the single-frame sprite surface for comparison.
+    """
+    frame = pygame.Surface((GBA_WIDTH, GBA_HEIGHT), 0, 32)
+    sprites = {"npc": GBASprite(16, 16).create_character("joseph", GREEN)}
+    static = sprites["npc"].bake()
+    store = EntityStore(seed=0)
+    rng = random.Random(0)
+    for _ in range(count):
+        store.spawn("npc", rng.uniform(0, GBA_WIDTH - 16), rng.uniform(0, GBA_HEIGHT - 16))
+    store.draw(frame, sprites)  # Bake the sheet outside the timing
+        
+    start = time.perf_counter()
+    for _ in range(frames):
+        store.update()
+        store.draw(frame, sprites)
+    animated = 1000 * (time.perf_counter() - start) / frames
+    
+    start = time.perf_counter()
+    for _ in range(frames):
+        store.update()
+        pos = store.pos[:store.count]
+        order = np.argsort(pos[:, 1], kind='stable')
+        frame.blits([(static, (x, y)) for x, y in pos[order].astype(np.int32).tolist()],
+                    doreturn=False)
+    return animated, 1000 * (time.perf_counter() - start) / frames
+
+# ============================================================================
+# NAVIGATION (Walkable grid, A* paths, flow fields)
+# ============================================================================
+
+NAV_CELL = 8                # Pixels per navigation cell
+NAV_BUDGET = 300            # Flow-field cells expanded per frame
+FEET = np.array([8, 14], dtype=np.float32)  # Sprite offset entities path by
+
+# Solid rects per map; drawn into the map layer and blocked on the grid
+MAP_OBSTACLES = {
+    "school": [(200, 50, 40, 100)],
+    "dark_forest": [(x, 50, 10, 30) for x in range(0, GBA_WIDTH, 40)],
+    "twilight_town": [(100, 60, 40, 60)]
+}
+
+class FlowField:
+    """Next-step table leading every cell toward one target cell
+
+    Retargeting starts a fresh Dijkstra from the new target that expands
+    a budget of cells per frame. Agents keep following the previous table
+    (which still leads next to the new target) until the new one is
+    complete and swapped in.
+    """
+    
+    def __init__(self, grid):
+        self.grid = grid
+        self.next = np.arange(grid.size)    # Cells point at themselves until built
+        self.target = None
+        self.heap = None
+        self.rebuilds = 0
+        
+    @property
+    def pending(self):
+        return self.heap is not None
+        
+    def retarget(self, cell):
+        self.target = cell
+        self.dist = [math.inf] * self.grid.size
+        self.dist[cell] = 0.0
+        self.building = list(range(self.grid.size))
+        self.heap = [(0.0, cell)]
+        
+    def expand(self, budget):
+        """Settle up to budget cells; returns how many were settled"""
+        heap, dist, building = self.heap, self.dist, self.building
+        links = self.grid.links
+        settled = 0
+        while heap and settled < budget:
+            d, cell = heapq.heappop(heap)
+            if d > dist[cell]:
+                continue
+            settled += 1
+            for neighbour, cost in links[cell]:
+                nd = d + cost
+                if nd < dist[neighbour]:
+                    dist[neighbour] = nd
+                    building[neighbour] = cell
+                    heapq.heappush(heap, (nd, neighbour))
+        if not heap:
+            self.next = np.array(building)
+            self.heap = None
+            self.rebuilds += 1
+        return settled
+
+class NavGrid:
+    """Walkable NAV_CELL grid built from a map's obstacle rects
+
+    Cells are indexed row * cols + col. find_path() runs A* for one-off
+    routes; track() keeps a named FlowField (e.g. "player") pointed at a
+    moving target, and update() spends a fixed per-frame budget
+    rebuilding only fields whose target changed cell.
+    """
+    
+    STEPS = [(dx, dy, math.hypot(dx, dy)) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+             if dx or dy]
+    
+    def __init__(self, obstacles=(), size=(GBA_WIDTH, GBA_HEIGHT), cell=NAV_CELL,
+                 budget=NAV_BUDGET):
+        self.cell_size = cell
+        self.cols, self.rows = size[0] // cell, size[1] // cell
+        self.size = self.cols * self.rows
+        self.budget = budget
+        self.walkable = np.ones((self.rows, self.cols), dtype=bool)
+        for x, y, w, h in obstacles:
+            self.walkable[y // cell:(y + h + cell - 1) // cell,
+                          x // cell:(x + w + cell - 1) // cell] = False
+        cols, rows = np.meshgrid(np.arange(self.cols), np.arange(self.rows))
+        self.centers = (np.stack([cols.ravel(), rows.ravel()], axis=1) * cell
+                        + cell / 2).astype(np.float32)
+        self.links = self._build_links()
+        self.nearest = self._nearest_walkable()
+        self.fields = {}    # target name -> FlowField
+        self.settled = 0    # Cells expanded by update() (stats)
+        
+    def _build_links(self):
+        """(neighbour, cost) per walkable cell, no cutting blocked corners"""
+        walk = self.walkable.tolist()
+        links = [[] for _ in range(self.size)]
+        for row in range(self.rows):
+            for col in range(self.cols):
+                if not walk[row][col]:
+                    continue
+                for dx, dy, cost in self.STEPS:
+                    r, c = row + dy, col + dx
+                    if (0 <= r < self.rows and 0 <= c < self.cols and walk[r][c]
+                            and walk[row][c] and walk[r][col]):
+                        links[row * self.cols + col].append((r * self.cols + c, cost))
+        return links
+        
+    def _nearest_walkable(self):
+        """Map every cell to a walkable cell (itself if walkable)"""
+        nearest = list(range(self.size))
+        frontier = deque(int(i) for i in np.flatnonzero(self.walkable.ravel()))
+        seen = set(frontier)
+        while frontier:
+            cell = frontier.popleft()
+            row, col = divmod(cell, self.cols)
+            for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                r, c = row + dy, col + dx
+                other = r * self.cols + c
+                if 0 <= r < self.rows and 0 <= c < self.cols and other not in seen:
+                    seen.add(other)
+                    nearest[other] = nearest[cell]
+                    frontier.append(other)
+        return nearest
+        
+    def cell(self, x, y):
+        """Cell index containing a pixel position"""
+        col = min(max(int(x) // self.cell_size, 0), self.cols - 1)
+        row = min(max(int(y) // self.cell_size, 0), self.rows - 1)
+        return row * self.cols + col
+        
+    def cells(self, points):
+        """Cell indices for an (n, 2) array of pixel positions"""
+        cols = np.clip(points[:, 0] // self.cell_size, 0, self.cols - 1).astype(np.intp)
+        rows = np.clip(points[:, 1] // self.cell_size, 0, self.rows - 1).astype(np.intp)
+        return rows * self.cols + cols
+        
+    def is_walkable(self, x, y):
+        return bool(self.walkable.flat[self.cell(x, y)])
+        
+    def find_path(self, start, goal):
+        """A* from start to goal cell; list of cells, empty if unreachable"""
+        goal = self.nearest[goal]
+        cols = self.cols
+        goal_row, goal_col = divmod(goal, cols)
+        
+        def estimate(cell):
+            # Octile distance in cells
+            row, col = divmod(cell, cols)
+            dx, dy = abs(col - goal_col), abs(row - goal_row)
+            return max(dx, dy) + (math.sqrt(2) - 1) * min(dx, dy)
+            
+        came_from = {start: None}
+        cost = {start: 0.0}
+        heap = [(estimate(start), start)]
+        while heap:
+            _, cell = heapq.heappop(heap)
+            if cell == goal:
+                path = []
+                while cell is not None:
+                    path.append(cell)
+                    cell = came_from[cell]
+                return path[::-1]
+            for neighbour, step in self.links[cell]:
+                new_cost = cost[cell] + step
+                if new_cost < cost.get(neighbour, math.inf):
+                    cost[neighbour] = new_cost
+                    came_from[neighbour] = cell
+                    heapq.heappush(heap, (new_cost + estimate(neighbour), neighbour))
+        return []
+        
+    def track(self, name, cell):
+        """Point a named flow field at a cell, rebuilding only if it moved"""
+        cell = self.nearest[cell]
+        field = self.fields.get(name)
+        if field is None:
+            field = self.fields[name] = FlowField(self)
+        if field.target != cell:
+            field.retarget(cell)
+        return field
+        
+    def update(self):
+        """Spend this frame's budget on fields that are being rebuilt"""
+        budget = self.budget
+        for field in self.fields.values():
+            if field.pending and budget > 0:
+                settled = field.expand(budget)
+                budget -= settled
+                self.settled += settled
+
+# ============================================================================
+# INPUT QUEUE (Timestamped ring buffer, edge/level queries, menu buffering)
+# ============================================================================
+
+FRAME_SECONDS = 1 / 60      # One GBA frame
+INPUT_RING = 256            # Events kept between frames
+POLL_HZ = 1000              # Polls per second while waiting for the next frame
+MENU_BUFFER = 0.15          # Seconds a menu press waits out a transition
+
+class KeyPress:
+    """One KEYDOWN with the time it was polled"""
+    __slots__ = ("key", "time")
+    
+    def __init__(self, key, when):
+        self.key = key
+        self.time = when
+        
+class InputQueue:
+    """SDL events drained into a timestamped ring buffer
+
+    Events are also polled while the loop waits for the next frame, so a
+    press keeps the time it happened rather than the time the next frame
+    got round to it. Each frame begin_frame() moves the ring into edge
+    (pressed/released) and level (held) state; a tap shorter than a frame
+    still counts as held for that frame.
+    """
+    
+    def __init__(self, size=INPUT_RING, poll_hz=POLL_HZ, clock=time.perf_counter):
+        self.ring = [None] * size   # (time, event)
+        self.head = 0               # Events written
+        self.tail = 0               # Events read
+        self.dropped = 0            # Overwritten before a frame read them
+        self.poll_interval = 1 / poll_hz if poll_hz else None
+        self.clock = clock
+        self.down = set()
+        self.pressed_now = {}       # key -> first press time this frame
+        self.released_now = set()
+        self.buffered = deque()     # KeyPress not yet handled by a scene
+        self.latencies = deque(maxlen=512)   # press -> judgement seconds
+        
+    def push(self, when, event):
+        if self.head - self.tail == len(self.ring):
+            self.tail += 1
+            self.dropped += 1
+        self.ring[self.head % len(self.ring)] = (when, event)
+        self.head += 1
+        
+    def poll(self):
+        """Drain SDL's event queue; injected events may carry their own "time\""""
+        now = self.clock()
+        for event in pygame.event.get():
+            self.push(getattr(event, "time", now), event)
+            
+    def wait(self, deadline):
+        """Sleep until deadline, polling at poll_hz on the way"""
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            if self.poll_interval is None:
+                time.sleep(deadline - now)
+                continue
+            time.sleep(min(self.poll_interval, deadline - now))
+            self.poll()
+            
+    def begin_frame(self):
+        """Take the events polled since last frame, oldest first"""
+        self.pressed_now.clear()
+        self.released_now.clear()
+        events = []
+        size = len(self.ring)
+        while self.tail < self.head:
+            when, event = self.ring[self.tail % size]
+            self.ring[self.tail % size] = None
+            self.tail += 1
+            if event.type == pygame.KEYDOWN:
+                self.down.add(event.key)
+                self.pressed_now.setdefault(event.key, when)
+                self.buffered.append(KeyPress(event.key, when))
+            elif event.type == pygame.KEYUP:
+                self.down.discard(event.key)
+                self.released_now.add(event.key)
+            events.append((when, event))
+        return events
+        
+    def pressed(self, key):
+        """Edge: key went down since last frame"""
+        return key in self.pressed_now
+        
+    def released(self, key):
+        """Edge: key went up since last frame"""
+        return key in self.released_now
+        
+    def held(self, key):
+        """Level: key is down, or was tapped since last frame"""
+        return key in self.down or key in self.pressed_now
+        
+    def press_time(self, key):
+        """When key was first pressed this frame, or None"""
+        return self.pressed_now.get(key)
+        
+    def take_presses(self, hold=False):
+        """Presses for the scene on top, oldest first
+
+        With hold=True (a menu behind a transition) presses stay buffered
+        until hold ends, dropping those older than MENU_BUFFER.
+        """
+        if hold:
+            now = self.clock()
+            while self.buffered and now - self.buffered[0].time > MENU_BUFFER:
+                self.buffered.popleft()
+            return []
+        presses = list(self.buffered)
+        self.buffered.clear()
+        return presses
+        
+    def judged(self, press):
+        """Record how long a press took to be judged"""
+        self.latencies.append(self.clock() - press.time)
+        
+    def latency_summary(self):
+        """Press-to-judgement latency (ms) as a dict"""
+        latencies = sorted(self.latencies)
+        return {
+            "judged": len(latencies),
+            "latency_ms": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p95_ms": 1000 * latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            "dropped": self.dropped,
+        }
 
 # ============================================================================
 # RHYTHM BATTLE SYSTEM (Mother 3 Style!)
 # ============================================================================
 
 class RhythmBattle:
-    """Mother 3-style rhythm combo battle system"""
+    """Mother 3-style rhythm combo battle system
+
+    Presses are judged by their timestamp against the nearest beat, so a
+    press polled between frames is not penalized for the frame it waited.
+    """
     
-    def __init__(self, synth):
+    PERFECT = 0.05  # Seconds either side of a beat
+    GOOD = 0.10
+    
+    def __init__(self, synth, font=None):
         self.synth = synth
+        self.font = font or GBAFont()
         self.rhythm_pattern = []
         self.current_pattern = []
         self.pattern_index = 0
@@ -199,12 +2104,13 @@ class RhythmBattle:
         self.combo = 0
         self.max_combo = 0
         self.rhythm_active = False
+        self.now = 0.0           # Time of the latest update
         
         # Visual feedback
         self.beat_circles = []
         self.hit_effects = []
         
-    def start_pattern(self, pattern_name="default"):
+    def start_pattern(self, pattern_name="default", now=None):
         """Start a rhythm pattern"""
         patterns = {
             "default": [1, 0, 1, 0, 1, 1, 0, 1],  # Simple 8-beat
@@ -218,6 +2124,8 @@ class RhythmBattle:
         self.beat_timer = 0
         self.combo = 0
         self.rhythm_active = True
+        if now is not None:
+            self.now = now
         
         # Create visual beat circles
         self.beat_circles = []
@@ -230,32 +2138,37 @@ class RhythmBattle:
                     'x': x, 'y': y, 
                     'radius': 8, 
                     'active': False,
-                    'beat_index': i
+                    'beat_index': i,
+                    'time': None,       # When the beat fired
+                    'judged': False
                 })
                 
-    def update(self):
-        """Update rhythm battle"""
+    def update(self, now=None):
+        """Update rhythm battle; now defaults to one frame after the last"""
         if not self.rhythm_active:
             return
             
+        self.now = self.now + FRAME_SECONDS if now is None else now
         self.beat_timer += 1
         
         # Check for beat
-        if self.beat_timer >= self.beat_interval:
-            self.beat_timer = 0
-            
-            # Activate current beat circle
-            for circle in self.beat_circles:
-                if circle['beat_index'] == self.pattern_index:
-                    circle['active'] = True
-                    circle['radius'] = 12
-                    
-            self.pattern_index += 1
-            
-            # End of pattern
-            if self.pattern_index >= len(self.rhythm_pattern):
-                self.rhythm_active = False
-                return True  # Pattern complete
+        if self.pattern_index < len(self.rhythm_pattern):
+            if self.beat_timer >= self.beat_interval:
+                self.beat_timer = 0
+                
+                # Activate current beat circle
+                for circle in self.beat_circles:
+                    if circle['beat_index'] == self.pattern_index:
+                        circle['active'] = True
+                        circle['radius'] = 12
+                        circle['time'] = self.now
+                        
+                self.pattern_index += 1
+                
+        # End of pattern once the last beat's late window has passed
+        elif self.beat_timer * FRAME_SECONDS > self.GOOD:
+            self.rhythm_active = False
+            return True  # Pattern complete
                 
         # Update circles
         for circle in self.beat_circles:
@@ -270,44 +2183,62 @@ class RhythmBattle:
                 
         return False
         
-    def check_hit(self):
-        """Check if player hit at right time (space bar)"""
+    def check_hit(self, press_time=None):
+        """Judge a press (space bar) by its offset from the nearest beat"""
         if not self.rhythm_active:
             return 0
+        if press_time is None:
+            press_time = self.now
             
-        # Find active beat
+        # Candidates: the beat that fired last and the one due next
+        nearest = None
         for circle in self.beat_circles:
-            if circle['active'] and circle['radius'] > 10:
-                # Check timing window
-                timing = abs(circle['radius'] - 10)
+            if circle['judged']:
+                continue
+            if circle['beat_index'] == self.pattern_index - 1:
+                beat_time = circle['time']
+            elif circle['beat_index'] == self.pattern_index:
+                beat_time = self.now + (self.beat_interval - self.beat_timer) * FRAME_SECONDS
+            else:
+                continue
+            offset = abs(press_time - beat_time)
+            if nearest is None or offset < nearest[0]:
+                nearest = (offset, circle)
+                
+        if nearest is not None and nearest[0] <= self.GOOD:
+            timing, circle = nearest
+            circle['judged'] = True
+            if timing <= self.PERFECT:  # PERFECT!
+                self.combo += 1
+                self.max_combo = max(self.max_combo, self.combo)
+                self.hit_effects.append({
+                    'x': circle['x'], 'y': circle['y'],
+                    'text': "PERFECT!",
+                    'color': YELLOW,
+                    'timer': 30
+                })
+                self.synth.play('rhythm_perfect', **self._voice(circle))
+                return 2.0  # 2x damage multiplier
+            else:  # GOOD
+                self.combo += 1
+                self.hit_effects.append({
+                    'x': circle['x'], 'y': circle['y'],
+                    'text': "GOOD!",
+                    'color': GREEN,
+                    'timer': 20
+                })
+                self.synth.play('rhythm_good', **self._voice(circle))
+                return 1.5  # 1.5x damage multiplier
                 
-                if timing < 1:  # PERFECT!
-                    self.combo += 1
-                    self.max_combo = max(self.max_combo, self.combo)
-                    self.hit_effects.append({
-                        'x': circle['x'], 'y': circle['y'],
-                        'text': "PERFECT!",
-                        'color': YELLOW,
-                        'timer': 30
-                    })
-                    self.synth.play('rhythm_perfect')
-                    return 2.0  # 2x damage multiplier
-                    
-                elif timing < 2:  # GOOD
-                    self.combo += 1
-                    self.hit_effects.append({
-                        'x': circle['x'], 'y': circle['y'],
-                        'text': "GOOD!",
-                        'color': GREEN,
-                        'timer': 20
-                    })
-                    self.synth.play('rhythm_good')
-                    return 1.5  # 1.5x damage multiplier
-                    
         # MISS
         self.combo = 0
         return 1.0  # Normal damage
         
+    def _voice(self, circle):
+        """Pan hits toward their circle and climb in pitch with the combo"""
+        return {'pan': (circle['x'] - GBA_WIDTH / 2) / (GBA_WIDTH / 2),
+                'pitch': 1.0 + 0.03 * min(self.combo, 10)}
+        
     def draw(self, surface):
         """Draw rhythm battle UI"""
         if not self.rhythm_active:
@@ -316,21 +2247,19 @@ class RhythmBattle:
         # Draw beat circles
         for circle in self.beat_circles:
             color = YELLOW if circle['active'] else GRAY
-            pygame.draw.circle(surface, color,
-                             (int(circle['x'] * SCALE), int(circle['y'] * SCALE)),
-                             int(circle['radius'] * SCALE), 2)
+            surface.circle(color, (int(circle['x']), int(circle['y'])),
+                           int(circle['radius']), 1)
                              
         # Draw hit effects
         for effect in self.hit_effects:
-            font = pygame.font.Font(None, 20)
-            text = font.render(effect['text'], True, effect['color'])
-            surface.blit(text, (int(effect['x'] * SCALE), int(effect['y'] * SCALE - 20)))
+            self.font.draw(surface, effect['text'],
+                           (int(effect['x']), int(effect['y']) - 7),
+                           effect['color'])
             
         # Draw combo counter
         if self.combo > 0:
-            font = pygame.font.Font(None, 24)
-            combo_text = font.render(f"COMBO: x{self.combo}", True, CYAN)
-            surface.blit(combo_text, (10 * SCALE, 10 * SCALE))
+            self.font.draw(surface, f"COMBO: x{self.combo}",
+                           (10, 10), CYAN)
 
 # ============================================================================
 # TIMED HIT BATTLE (Super Mario RPG Style!)
@@ -346,6 +2275,7 @@ class TimedHitBattle:
         self.timer = 0
         self.perfect_zone = 10  # Frames for perfect hit
         self.good_zone = 20     # Frames for good hit
+        self.now = 0.0          # Time of the latest update
         
         # Attack patterns
         self.patterns = {
@@ -354,18 +2284,21 @@ class TimedHitBattle:
             "special": [10, 25, 35, 50]
         }
         
-    def start_attack(self, attack_type):
+    def start_attack(self, attack_type, now=None):
         """Start a timed attack sequence"""
         self.active_attack = attack_type
         self.timing_window = self.patterns.get(attack_type, [30])[0]
         self.timer = 0
+        if now is not None:
+            self.now = now
         return True
         
-    def update(self):
-        """Update attack timer"""
+    def update(self, now=None):
+        """Update attack timer; now defaults to one frame after the last"""
         if not self.active_attack:
             return False
             
+        self.now = self.now + FRAME_SECONDS if now is None else now
         self.timer += 1
         
         # Check if we passed all timing windows
@@ -376,18 +2309,22 @@ class TimedHitBattle:
             
         return False
         
-    def check_hit(self):
+    def check_hit(self, press_time=None):
         """Check button press timing"""
         if not self.active_attack:
             return 0
             
         pattern = self.patterns.get(self.active_attack, [])
+        # Timer value when the key went down, which may be between updates
+        timer = self.timer
+        if press_time is not None:
+            timer += (press_time - self.now) / FRAME_SECONDS
         
         for i, frame in enumerate(pattern):
-            if frame - self.perfect_zone <= self.timer <= frame + self.perfect_zone:
+            if frame - self.perfect_zone <= timer <= frame + self.perfect_zone:
                 self.synth.play('rhythm_perfect')
                 return 2.0  # Perfect hit
-            elif frame - self.good_zone <= self.timer <= frame + self.good_zone:
+            elif frame - self.good_zone <= timer <= frame + self.good_zone:
                 self.synth.play('rhythm_good')
                 return 1.5  # Good hit
                 
@@ -401,149 +2338,621 @@ class TimedHitBattle:
         # Draw timing bar
         bar_width = 200
         bar_height = 20
-        bar_x = (GBA_WIDTH - bar_width) // 2 * SCALE
-        bar_y = 120 * SCALE
+        bar_x = (GBA_WIDTH - bar_width) // 2
+        bar_y = 120
         
-        pygame.draw.rect(surface, DARK_GRAY,
-                        (bar_x, bar_y, bar_width * SCALE, bar_height * SCALE))
-        pygame.draw.rect(surface, GRAY,
-                        (bar_x, bar_y, bar_width * SCALE, bar_height * SCALE), 2)
+        surface.rect(DARK_GRAY, (bar_x, bar_y, bar_width, bar_height))
+        surface.rect(GRAY, (bar_x, bar_y, bar_width, bar_height), 1)
                         
         # Draw timing zones
         pattern = self.patterns.get(self.active_attack, [30])
         max_time = max(pattern) + self.good_zone
         
         for frame in pattern:
-            x_pos = bar_x + (frame / max_time) * bar_width * SCALE
+            x_pos = bar_x + (frame / max_time) * bar_width
             # Perfect zone (small)
-            pygame.draw.rect(surface, YELLOW,
-                           (x_pos - self.perfect_zone * SCALE, bar_y,
-                            self.perfect_zone * 2 * SCALE, bar_height * SCALE))
+            surface.rect(YELLOW, (x_pos - self.perfect_zone, bar_y,
+                                  self.perfect_zone * 2, bar_height))
             # Good zone (larger)
-            pygame.draw.rect(surface, GREEN,
-                           (x_pos - self.good_zone * SCALE, bar_y,
-                            self.good_zone * 2 * SCALE, bar_height * SCALE), 1)
+            surface.rect(GREEN, (x_pos - self.good_zone, bar_y,
+                                 self.good_zone * 2, bar_height), 1)
                             
         # Draw cursor (current time)
-        cursor_x = bar_x + (self.timer / max_time) * bar_width * SCALE
-        pygame.draw.line(surface, RED,
-                        (cursor_x, bar_y - 10),
-                        (cursor_x, bar_y + bar_height * SCALE + 10),
-                        3)
+        cursor_x = bar_x + (self.timer / max_time) * bar_width
+        surface.line(RED, (cursor_x, bar_y - 3),
+                     (cursor_x, bar_y + bar_height + 3))
 
 # ============================================================================
 # GBA-STYLE DIALOGUE SYSTEM (EarthBound Style!)
 # ============================================================================
 
-class GBADialogue:
-    """EarthBound/Mother 3 style dialogue boxes"""
+class GBADialogue:
+    """EarthBound/Mother 3 style dialogue boxes"""
+    
+    def __init__(self, font, name_font=None):
+        self.font = font
+        self.name_font = name_font or GBAFont()
+        self.pages = []             # Queued (speaker, line) pages
+        self.speaker = None
+        self.current_message = ""
+        self.display_text = ""
+        self.char_index = 0
+        self.text_speed = 2
+        self.timer = 0
+        self.box_open = False
+        self.waiting = False
+        
+        # Text box appearance
+        self.box_color = BLACK
+        self.border_color = WHITE
+        self.text_color = WHITE
+        self.name_color = YELLOW
+        self.box_rect = pygame.Rect(10, 100, 220, 50)
+                                    
+    def show(self, text):
+        """Show dialogue text, one page per line"""
+        self.show_pages([(None, line) for line in text.split('\n')])
+        
+    def show_pages(self, pages):
+        """Show a sequence of (speaker, line) pages"""
+        self.pages = list(pages)
+        self._next_page()
+        self.box_open = True
+        
+    def _next_page(self):
+        self.speaker, self.current_message = self.pages.pop(0)
+        self.display_text = ""
+        self.char_index = 0
+        self.waiting = False
+        
+    def update(self):
+        """Update text display"""
+        if not self.box_open or self.waiting:
+            return
+            
+        self.timer += 1
+        if self.timer >= 2:  # Control text speed
+            self.timer = 0
+            
+            if self.char_index < len(self.current_message):
+                chars = min(self.text_speed, len(self.current_message) - self.char_index)
+                self.display_text += self.current_message[self.char_index:self.char_index + chars]
+                self.char_index += chars
+                
+                # Play text sound
+                # synth.play('text')
+                
+            if self.char_index >= len(self.current_message):
+                self.waiting = True
+                
+    def advance(self):
+        """Advance to next message or close"""
+        if not self.box_open:
+            return
+            
+        if self.waiting:
+            if self.pages:
+                self._next_page()
+            else:
+                self.box_open = False
+        else:
+            # Skip to end of current message
+            self.display_text = self.current_message
+            self.char_index = len(self.current_message)
+            self.waiting = True
+            
+    def draw(self, surface):
+        """Draw dialogue box"""
+        if not self.box_open:
+            return
+            
+        # Draw box with border
+        surface.rect(self.box_color, self.box_rect)
+        surface.rect(self.border_color, self.box_rect, 1)
+        
+        # Speaker name tab
+        if self.speaker:
+            width, height = self.name_font.size(self.speaker)
+            tab = pygame.Rect(self.box_rect.x, self.box_rect.y - height - 3,
+                              width + 6, height + 4)
+            surface.rect(self.box_color, tab)
+            surface.rect(self.border_color, tab, 1)
+            self.name_font.draw(surface, self.speaker, (tab.x + 3, tab.y + 2),
+                                self.name_color)
+        
+        # Draw text with word wrap
+        lines = self.font.wrap(self.display_text, self.box_rect.width - 8)
+            
+        # Draw lines
+        y_offset = self.box_rect.y + 4
+        for line in lines[:2]:  # Max 2 lines in GBA style
+            self.font.draw(surface, line, (self.box_rect.x + 4, y_offset),
+                           self.text_color)
+            y_offset += self.font.line_height
+            
+        # Draw continue arrow if waiting
+        if self.waiting:
+            arrow_x = self.box_rect.right - 7
+            arrow_y = self.box_rect.bottom - 5
+            points = [(arrow_x, arrow_y),
+                     (arrow_x - 3, arrow_y - 3),
+                     (arrow_x + 3, arrow_y - 3)]
+            surface.polygon(self.text_color, points)
+
+# ============================================================================
+# GAME DATA (Interned IDs for flags, items, party members and enemies)
+# ============================================================================
+
+# Story flags are bits of one int; scripts name them, the game tests masks
+FLAGS = ("met_shroom", "beat_goomba_sentinel", "trace_joined",
+         "met_royal_koopas", "met_shadow_luigi", "beat_final_boss")
+FLAG_IDS = {name: i for i, name in enumerate(FLAGS)}
+(MET_SHROOM, BEAT_GOOMBA_SENTINEL, TRACE_JOINED,
+ MET_ROYAL_KOOPAS, MET_SHADOW_LUIGI, BEAT_FINAL_BOSS) = (1 << i for i in range(len(FLAGS)))
+
+def flag_names(flags):
+    """Names of the bits set in a flag word"""
+    return [name for i, name in enumerate(FLAGS) if flags >> i & 1]
+
+# Inventory is one count per item id
+ITEMS = ("Starfruit", "Cosmic Candy")
+ITEM_IDS = {name: i for i, name in enumerate(ITEMS)}
+MAX_STACK = 99
+
+# Party members: (name, overworld sprite, max HP, TP)
+MEMBERS = (("Joseph", "joseph", 90, 50),
+           ("Becca", "becca", 120, 30),
+           ("Trace", "trace", 70, 80))
+MEMBER_IDS = {member[0]: i for i, member in enumerate(MEMBERS)}
+JOSEPH, BECCA, TRACE = range(len(MEMBERS))
+
+class MemberStats:
+    """HP/TP record of one party member"""
+    __slots__ = ("hp", "max_hp", "tp", "level")
+    
+    def __init__(self, hp, tp, level=1):
+        self.hp = self.max_hp = hp
+        self.tp = tp
+        self.level = level
+        
+@dataclass(frozen=True)
+class EnemyType:
+    """Battle sprite, minigame and rewards of one enemy"""
+    name: str
+    sprite: Optional[str]           # Battle sprite (None: not drawn)
+    y: int
+    system: str                     # "rhythm" pattern or "timed" attack
+    pattern: str
+    defeat_flag: int = 0
+    defeat_cutscene: Optional[str] = None
+    
+ENEMIES = (
+    EnemyType("Shroom Scout", "shroom", 40, "rhythm", "default"),
+    EnemyType("Goomba Sentinel", "goomba", 30, "rhythm", "boss", BEAT_GOOMBA_SENTINEL),
+    EnemyType("Royal Koopa Alpha", None, 30, "timed", "hammer"),
+    EnemyType("Royal Koopa Beta", None, 30, "timed", "hammer"),
+    EnemyType("Shadow Luigi", None, 30, "rhythm", "fast"),
+    EnemyType("Bowser Lord of Embers", None, 30, "timed", "special",
+              BEAT_FINAL_BOSS, "ending"),
+)
+ENEMY_IDS = {enemy.name: i for i, enemy in enumerate(ENEMIES)}
+SHROOM_SCOUT = ENEMY_IDS["Shroom Scout"]
+
+# Save data is a run of 16-bit words:
+#   version chapter scene map x y flags, hp max_hp tp level per member,
+#   party size + member ids, one count per item
+SAVE_VERSION = 1
+SAVE_MAPS = ("school", "dark_forest", "twilight_town")     # map id -> name
+
+# ============================================================================
+# CUTSCENE SCRIPTING (Compiled bytecode + tiny VM)
+# ============================================================================
+
+# Story scripts, one per chapter. Syntax:
+#   :label                  start of a cutscene
+#   Speaker: line           spoken line ("  line" continues the last speaker)
+#   > line                  narration
+#   @flag name | @scene n | @chapter n | @join Name | @leave Name
+#   @warp map x y | @battle Enemy | Enemy ...
+CHAPTER_SCRIPTS = {
+    1: """
+:intro
+> TF!DELTARUNE
+> Chapters 1+2
+> Threshold Academy
+> Monday Morning
+Joseph: Another ordinary day...
+  Or so I thought.
+
+:becca_hint
+Becca: Joseph! Over here!
+  The supply room looks suspicious...
+
+:supply_room
+@scene 1
+Joseph: Huh? The supply room door is open...
+Becca: Everyone, stay close. We're going in.
+@warp dark_forest 30 80
+
+:meet_shroom
+@flag met_shroom
+Shroom Scout: Halt! You trespass in the Dark World!
+Joseph: We don't mean any harm!
+Becca: Get ready for battle!
+@battle Shroom Scout
+
+:goomba_sentinel
+Goomba Sentinel: I am the guardian of the First Gate!
+  Prove your worth, Lightners!
+@battle Goomba Sentinel
+
+:trace_joins
+@flag trace_joined
+Trace: That was amazing! Can I join you?
+Becca: ...Alright. But stay close.
+Trace: YES! Adventure time!
+@join Trace
+@chapter 2
+@warp twilight_town 30 80
+""",
+    2: """
+:royal_koopas
+@flag met_royal_koopas
+Royal Koopa Alpha: Halt! Who approaches the Second Gate?
+Royal Koopa Beta: Lightners! In our domain!
+Joseph: We just want to pass through!
+@battle Royal Koopa Alpha | Royal Koopa Beta
+
+:shadow_luigi
+@flag met_shadow_luigi
+Shadow Luigi: Yahoo! Finally, some fun visitors!
+  Let's play a game! Catch me if you can!
+@battle Shadow Luigi
+
+:final_boss
+@flag beat_final_boss
+Bowser Lord of Embers: So. The Lightners have come at last.
+  I am the seal. The guardian.
+  If I fall... everything ends.
+@battle Bowser Lord of Embers
+
+:ending
+Bowser Lord of Embers: ...You showed me mercy.
+  After all I've done... why?
+Joseph: Because everyone deserves a second chance.
+Becca: The Dark World is safe now.
+  And so are we.
+Trace: That was the BEST adventure ever!
+> THE END
+> Thanks for playing!
+> Team Flames ♡
+"""
+}
+
+# Opcodes (operands are 16-bit words; strings are string-table indices,
+# flags, members and enemies are their interned ids)
+OP_END = 0       #
+OP_SAY = 1       # speaker line  (speaker NO_SPEAKER = narration)
+OP_FLAG = 2      # flag
+OP_SCENE = 3     # n
+OP_CHAPTER = 4   # n
+OP_JOIN = 5      # member
+OP_LEAVE = 6     # member
+OP_WARP = 7      # map x y
+OP_BATTLE = 8    # count enemy...
+NO_SPEAKER = 0xFFFF
+
+@dataclass
+class CompiledScript:
+    """Bytecode, string table and cutscene entry points of one chapter"""
+    code: array
+    strings: Tuple[str, ...]
+    entries: Dict[str, int]
+    
+    def size_bytes(self):
+        return (self.code.itemsize * len(self.code) +
+                sum(len(s.encode()) for s in self.strings))
+
+def compile_script(source):
+    """Compile cutscene script source into bytecode and a string table"""
+    code = array('H')
+    strings = []
+    interned = {}
+    entries = {}
+    speaker = NO_SPEAKER
+    
+    def intern(text):
+        if text not in interned:
+            interned[text] = len(strings)
+            strings.append(text)
+        return interned[text]
+        
+    def lookup(table, name, kind):
+        if name not in table:
+            raise ValueError(f"unknown {kind} '{name}'")
+        return table[name]
+        
+    for number, raw in enumerate(source.splitlines(), 1):
+        line = raw.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            if line.startswith(':'):
+                if entries:
+                    code.append(OP_END)
+                entries[line[1:].strip()] = len(code)
+                speaker = NO_SPEAKER
+            elif line.startswith('>'):
+                speaker = NO_SPEAKER
+                code.extend((OP_SAY, NO_SPEAKER, intern(line[1:].strip())))
+            elif line.startswith('@'):
+                command, _, args = line[1:].partition(' ')
+                if command == 'flag':
+                    code.extend((OP_FLAG, lookup(FLAG_IDS, args.strip(), 'flag')))
+                elif command in ('scene', 'chapter'):
+                    code.extend((OP_SCENE if command == 'scene' else OP_CHAPTER,
+                                 int(args)))
+                elif command in ('join', 'leave'):
+                    code.extend((OP_JOIN if command == 'join' else OP_LEAVE,
+                                 lookup(MEMBER_IDS, args.strip(), 'party member')))
+                elif command == 'warp':
+                    map_name, x, y = args.split()
+                    code.extend((OP_WARP, intern(map_name), int(x), int(y)))
+                elif command == 'battle':
+                    enemies = [lookup(ENEMY_IDS, e.strip(), 'enemy')
+                               for e in args.split('|')]
+                    code.extend((OP_BATTLE, len(enemies), *enemies))
+                else:
+                    raise ValueError(f"unknown command @{command}")
+            elif raw.startswith(' '):
+                code.extend((OP_SAY, speaker, intern(line)))
+            else:
+                name, sep, text = line.partition(': ')
+                if not sep:
+                    raise ValueError("expected 'Speaker: line'")
+                speaker = intern(name)
+                code.extend((OP_SAY, speaker, intern(text)))
+        except ValueError as e:
+            raise ValueError(f"script line {number}: {e}") from None
+    code.append(OP_END)
+    return CompiledScript(code, tuple(strings), entries)
+
+class CutsceneLibrary:
+    """Compiles chapter scripts lazily, keeping only the active chapter"""
+    
+    def __init__(self, sources=CHAPTER_SCRIPTS):
+        self.sources = sources
+        self.chapter = None
+        self.script = None
+        
+    def load_chapter(self, chapter):
+        if chapter != self.chapter:
+            self.script = compile_script(self.sources[chapter])
+            self.chapter = chapter
+        return self.script
+
+class CutsceneVM:
+    """Runs compiled cutscenes, pausing on dialogue and battles"""
+    
+    def __init__(self, game, library=None):
+        self.game = game
+        self.library = library or CutsceneLibrary()
+        self.script = None
+        self.pc = 0
+        self.wait = None    # "dialogue" / "battle" while blocked
+        self.starts = {}    # label -> times started (playtest soft-lock checks)
+        
+    @property
+    def running(self):
+        return self.script is not None
+        
+    def preload(self, chapter):
+        """Compile a chapter ahead of its first cutscene"""
+        self.library.load_chapter(chapter)
+        
+    def start(self, label):
+        """Start a cutscene of the current chapter"""
+        self.script = self.library.load_chapter(self.game.chapter)
+        self.pc = self.script.entries[label]
+        self.starts[label] = self.starts.get(label, 0) + 1
+        self.wait = None
+        self._run()
+        
+    def update(self):
+        """Resume once the dialogue or battle we are waiting on is over"""
+        if self.script is None:
+            return
+        if self.wait == "dialogue" and self.game.dialogue.box_open:
+            return
+        if self.wait == "battle" and self.game.in_battle:
+            return
+        self.wait = None
+        self._run()
+        
+    def _run(self):
+        game = self.game
+        code = self.script.code
+        strings = self.script.strings
+        pc = self.pc
+        pages = []
+        while True:
+            op = code[pc]
+            if op == OP_SAY:
+                speaker = code[pc + 1]
+                pages.append((None if speaker == NO_SPEAKER else strings[speaker],
+                              strings[code[pc + 2]]))
+                pc += 3
+                continue
+            if pages:
+                # Consecutive lines share one dialogue box
+                game._show_dialogue(pages)
+                self.wait = "dialogue"
+                break
+            if op == OP_END:
+                self.script = None
+                break
+            elif op == OP_FLAG:
+                game.flags |= 1 << code[pc + 1]
+                pc += 2
+            elif op == OP_SCENE:
+                game.scene = code[pc + 1]
+                pc += 2
+            elif op == OP_CHAPTER:
+                game.chapter = code[pc + 1]
+                game.assets.enter_scope(f"chapter:{game.chapter}")
+                self.preload(game.chapter)  # Running script keeps its own code
+                pc += 2
+            elif op == OP_JOIN:
+                if code[pc + 1] not in game.party:
+                    game.party.append(code[pc + 1])
+                pc += 2
+            elif op == OP_LEAVE:
+                if code[pc + 1] in game.party:
+                    game.party.remove(code[pc + 1])
+                pc += 2
+            elif op == OP_WARP:
+                game._change_map(strings[code[pc + 1]], (code[pc + 2], code[pc + 3]))
+                pc += 4
+            elif op == OP_BATTLE:
+                count = code[pc + 1]
+                game._start_battle(code[pc + 2:pc + 2 + count].tolist())
+                pc += 2 + count
+                self.wait = "battle"
+                break
+        self.pc = pc
+
+# ============================================================================
+# SCENE STACK (Table-driven game states)
+# ============================================================================
+
+class Scene:
+    """One game state on the scene stack
+
+    Overlay scenes are drawn on top of a cached snapshot of the scene
+    below them instead of re-rendering it every frame.
+    """
+    
+    name = ""
+    overlay = False
+    dim_below = False   # Darken the cached snapshot (pause menu)
+    buffered = False    # Hold presses until a screen transition ends
+    
+    def __init__(self, game):
+        self.game = game
+        
+    def handle_event(self, press):
+        """Handle a KeyPress; return False to quit"""
+        return True
+        
+    def update(self):
+        pass
+        
+    def draw(self, frame):
+        pass
+
+class TitleScene(Scene):
+    name = "title"
+    buffered = True
+    
+    def handle_event(self, press):
+        if press.key == pygame.K_z:
+            self.game.finish_startup()
+            self.game.state = "game"
+            self.game._start_chapter1()
+        elif press.key == pygame.K_x:
+            return False
+        return True
+        
+    def draw(self, frame):
+        self.game._draw_title()
+
+class OverworldScene(Scene):
+    name = "game"
     
-    def __init__(self, font):
-        self.font = font
-        self.messages = []
-        self.current_message = ""
-        self.display_text = ""
-        self.char_index = 0
-        self.text_speed = 2
-        self.timer = 0
-        self.box_open = False
-        self.waiting = False
+    def handle_event(self, press):
+        if press.key == pygame.K_z:
+            self.game._check_interaction()
+        elif press.key == pygame.K_x:
+            self.game.state = "menu"
+        elif press.key == pygame.K_c:
+            # Quick battle test
+            self.game._start_battle([SHROOM_SCOUT])
+        return True
         
-        # Text box appearance
-        self.box_color = BLACK
-        self.border_color = WHITE
-        self.text_color = WHITE
-        self.box_rect = pygame.Rect(10 * SCALE, 100 * SCALE,
-                                   220 * SCALE, 50 * SCALE)
-                                    
-    def show(self, text):
-        """Show dialogue text"""
-        self.messages = text.split('\n')
-        self.current_message = self.messages.pop(0)
-        self.display_text = ""
-        self.char_index = 0
-        self.box_open = True
-        self.waiting = False
+    def update(self):
+        self.game._update_overworld()
+        
+    def draw(self, frame):
+        self.game._draw_overworld()
+
+class DialogueScene(Scene):
+    name = "dialogue"
+    overlay = True
+    buffered = True
+    
+    def handle_event(self, press):
+        dialogue = self.game.dialogue
+        if press.key == pygame.K_z:
+            dialogue.advance()
+            if not dialogue.box_open:
+                self.game.pop_scene()
+        return True
         
     def update(self):
-        """Update text display"""
-        if not self.box_open or self.waiting:
-            return
-            
-        self.timer += 1
-        if self.timer >= 2:  # Control text speed
-            self.timer = 0
-            
-            if self.char_index < len(self.current_message):
-                chars = min(self.text_speed, len(self.current_message) - self.char_index)
-                self.display_text += self.current_message[self.char_index:self.char_index + chars]
-                self.char_index += chars
-                
-                # Play text sound
-                # synth.play('text')
-                
-            if self.char_index >= len(self.current_message):
-                self.waiting = True
-                
-    def advance(self):
-        """Advance to next message or close"""
-        if not self.box_open:
-            return
-            
-        if self.waiting:
-            if self.messages:
-                self.current_message = self.messages.pop(0)
-                self.display_text = ""
-                self.char_index = 0
-                self.waiting = False
+        self.game.dialogue.update()
+        
+    def draw(self, frame):
+        self.game.dialogue.draw(frame)
+
+class BattleScene(Scene):
+    name = "battle"
+    
+    def handle_event(self, press):
+        game = self.game
+        if press.key == pygame.K_z:
+            if game.rhythm_battle.rhythm_active:
+                multiplier = game.rhythm_battle.check_hit(press.time)
+                game.input.judged(press)
+                game._hit_feedback(multiplier)
+                # Apply damage with multiplier
+            elif game.timed_battle.active_attack:
+                multiplier = game.timed_battle.check_hit(press.time)
+                game.input.judged(press)
+                game._hit_feedback(multiplier)
+                # Apply damage
             else:
-                self.box_open = False
-        else:
-            # Skip to end of current message
-            self.display_text = self.current_message
-            self.char_index = len(self.current_message)
-            self.waiting = True
-            
-    def draw(self, surface):
-        """Draw dialogue box"""
-        if not self.box_open:
-            return
-            
-        # Draw box with border
-        pygame.draw.rect(surface, self.box_color, self.box_rect)
-        pygame.draw.rect(surface, self.border_color, self.box_rect, 2)
+                # Select menu option
+                game._battle_select()
+        elif press.key == pygame.K_SPACE:
+            # Rhythm hit check
+            if game.rhythm_battle.rhythm_active:
+                multiplier = game.rhythm_battle.check_hit(press.time)
+                game.input.judged(press)
+                game._hit_feedback(multiplier)
+        return True
         
-        # Draw text with word wrap
-        words = self.display_text.split(' ')
-        lines = []
-        current_line = ""
+    def update(self):
+        self.game._update_battle()
         
-        for word in words:
-            test_line = current_line + word + " "
-            if self.font.size(test_line)[0] < self.box_rect.width - 20:
-                current_line = test_line
-            else:
-                lines.append(current_line)
-                current_line = word + " "
-                
-        if current_line:
-            lines.append(current_line)
-            
-        # Draw lines
-        y_offset = self.box_rect.y + 10
-        for line in lines[:2]:  # Max 2 lines in GBA style
-            text = self.font.render(line, True, self.text_color)
-            surface.blit(text, (self.box_rect.x + 10, y_offset))
-            y_offset += 16
-            
-        # Draw continue arrow if waiting
-        if self.waiting:
-            arrow_x = self.box_rect.right - 20
-            arrow_y = self.box_rect.bottom - 15
-            points = [(arrow_x, arrow_y),
-                     (arrow_x - 10, arrow_y - 10),
-                     (arrow_x + 10, arrow_y - 10)]
-            pygame.draw.polygon(surface, self.text_color, points)
+    def draw(self, frame):
+        self.game._draw_battle()
+
+class MenuScene(Scene):
+    name = "menu"
+    overlay = True
+    dim_below = True
+    buffered = True
+    
+    def handle_event(self, press):
+        if press.key == pygame.K_x:
+            self.game.pop_scene()
+        return True
+        
+    def draw(self, frame):
+        self.game._draw_menu()
+
+SCENES = {scene.name: scene for scene in
+          (TitleScene, OverworldScene, DialogueScene, BattleScene, MenuScene)}
 
 # ============================================================================
 # CHAPTER 1+2 COMPLETE GAME
@@ -552,40 +2961,80 @@ class GBADialogue:
 class TFDeltaRuneGBA:
     """Complete Chapters 1+2 in GBA style"""
     
-    def __init__(self):
-        pygame.init()
+    def __init__(self, upscaler="nearest", threaded=False, use_asyncio=False,
+                 poll_hz=POLL_HZ, staged=False, timeline=None):
+        """Create the game; staged=True shows the title before loading the rest
+
+        Staged startup brings up only the display and title fonts, then
+        presents the title at once. Audio, sprites and the other deferred
+        stages run one per frame (finish_startup() runs the rest at once).
+        """
+        self.startup = timeline or StartupTimeline()
+        pygame.display.init()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("TF!Deltarune GBA Edition - Chapters 1+2 Complete")
         self.clock = pygame.time.Clock()
+        self.startup.mark("display")
+        
+        # Native GBA framebuffer, scaled to the window on present
+        self.frame = pygame.Surface((GBA_WIDTH, GBA_HEIGHT), 0, 32)
+        self.canvas = RenderList()  # Draw commands of the frame being recorded
+        self.layers = []            # [ops, surface] cached per overlay depth
         
-        # GBA-style font
-        self.font = pygame.font.Font(None, 16 * SCALE)
-        self.title_font = pygame.font.Font(None, 32 * SCALE)
+        # Optional simulation / presentation threads
+        self.threaded = threaded
+        self.use_asyncio = use_asyncio
+        self.scheduler = FrameScheduler()   # Background jobs of the asyncio loop
+        self.pipeline = RenderPipeline()
+        self.present_stats = PresentStats()
+        self.capture = None         # FrameCapture for visual regression runs
+        self.inputs = deque()       # (poll time, event) for the simulation
+        self.input = InputQueue(poll_hz=poll_hz)
+        self.frame_time = 0.0       # input.clock() when this frame's input was taken
+        self.input_time = None
+        self.frame_number = 0
+        self.running = False
+        self.simulation_error = None
+        
+        self.profiler = FrameProfiler()
+        self.present_profiler = FrameProfiler() if threaded else self.profiler
+        self.effects = ScreenEffects(profiler=self.present_profiler)
+        self.upscaler = Upscaler(upscaler, profiler=self.present_profiler)
+        
+        self.startup.mark("framebuffer + effects")
+        
+        # GBA-style fonts the title needs; the dialogue font is a later stage
+        self.font = GBAFont()
+        self.title_font = GBAFont(scale=2)
+        self.dialogue_font = None
+        self.startup.mark("title fonts", "generation")
         
         # Game systems
-        self.synth = GBASynth()
-        self.rhythm_battle = RhythmBattle(self.synth)
+        self.assets = AssetManager()
+        self.synth = GBASynth(self.assets, open_audio=False)
+        self.rhythm_battle = RhythmBattle(self.synth, self.font)
         self.timed_battle = TimedHitBattle(self.synth)
-        self.dialogue = GBADialogue(self.font)
+        self.dialogue = None
         
         # Game state
+        self.scenes = {name: scene(self) for name, scene in SCENES.items()}
+        self.scene_stack = []
+        self.snapshot = ()          # Frozen render list below the top overlay
+        self.snapshot_valid = False
         self.state = "title"
         self.chapter = 1
         self.scene = 0
-        self.party = ["Joseph", "Becca"]
-        self.inventory = ["Starfruit", "Starfruit", "Cosmic Candy"]
-        self.bosses_defeated = []
-        
-        # Player stats
-        self.stats = {
-            "Joseph": {"hp": 90, "max_hp": 90, "tp": 50, "level": 1},
-            "Becca": {"hp": 120, "max_hp": 120, "tp": 30, "level": 1},
-            "Trace": {"hp": 70, "max_hp": 70, "tp": 80, "level": 1}
-        }
+        self.party = [JOSEPH, BECCA]                # member ids
+        self.inventory = array('H', [0] * len(ITEMS))   # count per item id
+        self.add_item("Starfruit", 2)
+        self.add_item("Cosmic Candy")
+        
+        # Player stats, indexed by member id
+        self.stats = [MemberStats(hp, tp) for _, _, hp, tp in MEMBERS]
         
         # Battle state
         self.in_battle = False
-        self.battle_enemies = []
+        self.battle_enemies = []    # enemy ids
         self.battle_turn = 0
         self.battle_menu = 0
         self.battle_submenu = 0
@@ -594,254 +3043,452 @@ class TFDeltaRuneGBA:
         self.current_map = "school"
         self.player_pos = [GBA_WIDTH // 2, GBA_HEIGHT // 2]
         self.player_dir = "down"
+        self.player_action = "idle"
+        self.player_clock = 0
+        # Seeded from `random` so seeded headless runs replay exactly
+        self.npcs = EntityStore(seed=random.getrandbits(32))
+        self.battle_entities = EntityStore(seed=random.getrandbits(32))
+        self.nav = None             # Built by a startup stage
+        self.nav_grids = {}         # map name -> NavGrid
+        self.followers = {}         # party member id -> entity id in npcs
+        self.chasers = []           # entity ids in npcs
         
-        # Game progress flags
-        self.story_flags = {
-            "met_shroom": False,
-            "beat_goomba_sentinel": False,
-            "trace_joined": False,
-            "met_royal_koopas": False,
-            "met_shadow_luigi": False,
-            "beat_final_boss": False
-        }
+        # Game progress flags (bitset of FLAGS)
+        self.flags = 0
         
-        # Create sprites
-        self.sprites = {}
-        self._create_sprites()
+        self.cutscene = CutsceneVM(self)
+        self.sprites = self.assets.view("sprite")
+        self.startup.mark("game state")
         
-        # Start music
+        # Everything the title screen can do without: (phase, kind, stage).
+        # Subsystems are opened one by one; the mixer opens at SAMPLE_RATE
+        # in the audio stage instead of at pygame.init()'s default rate
+        self.startup_stages = deque([
+            ("audio + sounds", "generation", self._start_audio),
+            ("dialogue font", "generation", self._create_dialogue),
+            ("sprites", "generation", self._create_sprites),
+            ("nav grid", "generation", lambda: setattr(self, "nav", NavGrid())),
+            # Story scripts (compiled before the first cutscene)
+            ("story scripts", "generation", lambda: self.cutscene.preload(self.chapter)),
+        ])
+        if staged:
+            self.draw()
+            self.startup.title_visible()
+        else:
+            self.finish_startup()
+            
+    def _startup_step(self):
+        """Run the next deferred startup stage, if any"""
+        if self.startup_stages:
+            phase, kind, stage = self.startup_stages.popleft()
+            with self.startup.phase(phase, kind):
+                stage()
+            
+    def finish_startup(self):
+        """Run all remaining startup stages now"""
+        while self.startup_stages:
+            self._startup_step()
+            
+    def _start_audio(self):
+        self.synth.open()
         self.synth.play_music("overworld")
         
+    def _create_dialogue(self):
+        self.dialogue_font = GBAFont(tall=True)
+        self.dialogue = GBADialogue(self.dialogue_font, self.font)
+        
     def _create_sprites(self):
-        """Create all game sprites"""
+        """Register all game sprites and map layers with the asset manager"""
+        register = self.assets.register
         # Party members
-        self.sprites["joseph"] = GBASprite(16, 16).create_character("joseph", BLUE)
-        self.sprites["becca"] = GBASprite(16, 16).create_character("joseph", PURPLE)
-        self.sprites["trace"] = GBASprite(16, 16).create_character("joseph", YELLOW)
+        register("sprite", "joseph", "global",
+                 lambda: GBASprite(16, 16).create_character("joseph", BLUE))
+        register("sprite", "becca", "global",
+                 lambda: GBASprite(16, 16).create_character("joseph", PURPLE))
+        register("sprite", "trace", "chapter:2",
+                 lambda: GBASprite(16, 16).create_character("joseph", YELLOW))
         
         # Enemies
-        self.sprites["shroom"] = GBASprite(16, 16).create_character("shroom", ENEMY_RED)
-        self.sprites["goomba"] = GBASprite(24, 24).create_character("shroom", ENEMY_BROWN)
+        register("sprite", "shroom", "battle",
+                 lambda: GBASprite(16, 16).create_character("shroom", ENEMY_RED))
+        register("sprite", "goomba", "battle",
+                 lambda: GBASprite(24, 24).create_character("shroom", ENEMY_BROWN))
+        # Overworld chasers belong to their map; the battle scope is only
+        # active during a battle
+        register("sprite", "forest_shroom", "map:dark_forest",
+                 lambda: GBASprite(16, 16).create_character("shroom", ENEMY_RED))
         
-    def handle_events(self):
-        """Handle all input"""
-        for event in pygame.event.get():
+        # Townsfolk
+        register("sprite", "townsfolk_a", "map:twilight_town",
+                 lambda: GBASprite(16, 16).create_character("joseph", GREEN))
+        register("sprite", "townsfolk_b", "map:twilight_town",
+                 lambda: GBASprite(16, 16).create_character("joseph", CYAN))
+        
+        # Map backgrounds
+        for map_name in MAP_PREFETCH:
+            register("map", map_name, "map:" + map_name,
+                     lambda map_name=map_name: self._bake_map_layer(map_name))
+            
+    def _bake_map_layer(self, map_name):
+        """Render a map's static background once"""
+        layer = pygame.Surface((GBA_WIDTH, GBA_HEIGHT))
+        if map_name == "school":
+            layer.fill((60, 60, 80))
+            solid = ENEMY_BROWN     # Supply room wall
+        elif map_name == "dark_forest":
+            layer.fill((20, 30, 20))
+            solid = ENEMY_GREEN     # Trees
+        elif map_name == "twilight_town":
+            layer.fill((40, 30, 50))
+            solid = PURPLE          # Buildings
+        for rect in MAP_OBSTACLES.get(map_name, []):
+            pygame.draw.rect(layer, solid, rect)
+        return layer
+        
+    def _change_map(self, map_name, pos):
+        """Fade to black and move to another map"""
+        self.effects.fade_transition(
+            on_black=lambda: self._enter_map(map_name, pos))
+        
+    def _enter_map(self, map_name, pos):
+        """Switch maps, swapping asset scopes"""
+        self.current_map = map_name
+        self.player_pos = list(pos)
+        self.assets.enter_scope("map:" + map_name)
+        self.snapshot_valid = False
+        for scope in MAP_PREFETCH.get(map_name, []):
+            if self.scheduler.running:
+                self.scheduler.spawn(f"prefetch {scope}",
+                                     self.assets.prefetch_async(scope, self.scheduler),
+                                     deadline=PREFETCH_DEADLINE)
+            else:
+                self.assets.prefetch(scope)
+            
+        if map_name not in self.nav_grids:
+            self.nav_grids[map_name] = NavGrid(MAP_OBSTACLES.get(map_name, []))
+        self.nav = self.nav_grids[map_name]
+            
+        # Populate the map
+        self.npcs.clear()
+        for sprite, count in MAP_NPCS.get(map_name, []):
+            for _ in range(count):
+                self.npcs.spawn(sprite,
+                                random.uniform(0, GBA_WIDTH - 16),
+                                random.uniform(20, GBA_HEIGHT - 16))
+        self.chasers = []
+        for sprite, count in MAP_CHASERS.get(map_name, []):
+            for _ in range(count):
+                while True:     # Re-roll the whole spot; a blocked column never clears
+                    x, y = random.uniform(140, GBA_WIDTH - 16), random.uniform(0, GBA_HEIGHT - 16)
+                    if self.nav.is_walkable(x + FEET[0], y + FEET[1]):
+                        break
+                self.chasers.append(self.npcs.spawn(sprite, x, y, state=EntityStore.PATH,
+                                                    speed=0.6))
+        self.followers = {}
+        self._spawn_followers()
+        
+    def _spawn_followers(self):
+        """Party members after the leader trail them through the flow field"""
+        for i in self.followers.values():
+            self.npcs.despawn(i)
+        x, y = self.player_pos
+        self.followers = {
+            member: self.npcs.spawn(MEMBERS[member][1], x, y, state=EntityStore.PATH,
+                                    speed=2.0, stop=14.0 * (n + 1))
+            for n, member in enumerate(self.party[1:])
+        }
+        
+    def save_data(self):
+        """Pack progress, stats, party and inventory into save words"""
+        x, y = self.player_pos
+        words = array('H', (SAVE_VERSION, self.chapter, self.scene,
+                            SAVE_MAPS.index(self.current_map), int(x), int(y), self.flags))
+        for stats in self.stats:
+            words.extend((stats.hp, stats.max_hp, stats.tp, stats.level))
+        words.append(len(self.party))
+        words.extend(self.party)
+        words.extend(self.inventory)
+        return words.tobytes()
+        
+    def load_data(self, data):
+        """Restore a save_data() blob and enter its map
+
+        A blob of the wrong version or shape raises ValueError before any
+        state is changed.
+        """
+        if len(data) % 2:
+            raise ValueError("save data is not a whole number of words")
+        words = array('H')
+        words.frombytes(data)
+        if not words or words[0] != SAVE_VERSION:
+            raise ValueError(f"unsupported save version {words[0] if words else None}")
+        pos = 7 + 4 * len(self.stats)
+        if len(words) <= pos:
+            raise ValueError("truncated save data")
+        count = words[pos]
+        members = words[pos + 1:pos + 1 + count]
+        if (len(words) != pos + 1 + count + len(ITEMS) or words[3] >= len(SAVE_MAPS)
+                or any(member >= len(MEMBERS) for member in members)):
+            raise ValueError("malformed save data")
+        _, self.chapter, self.scene, map_id, x, y, self.flags = words[:7]
+        pos = 7
+        for stats in self.stats:
+            stats.hp, stats.max_hp, stats.tp, stats.level = words[pos:pos + 4]
+            pos += 4
+        count = words[pos]
+        self.party = words[pos + 1:pos + 1 + count].tolist()
+        pos += 1 + count
+        self.inventory = array('H', (min(count, MAX_STACK)
+                                     for count in words[pos:pos + len(ITEMS)]))
+        self.assets.enter_scope(f"chapter:{self.chapter}")
+        self.cutscene.preload(self.chapter)
+        self._enter_map(SAVE_MAPS[map_id], (x, y))
+        
+    def add_item(self, name, count=1):
+        """Add up to MAX_STACK of an item, returning how many fit"""
+        i = ITEM_IDS[name]
+        added = min(count, MAX_STACK - self.inventory[i])
+        self.inventory[i] += added
+        return added
+        
+    def remove_item(self, name, count=1):
+        """Take count of an item if that many are held"""
+        i = ITEM_IDS[name]
+        if self.inventory[i] < count:
+            return False
+        self.inventory[i] -= count
+        return True
+        
+    @property
+    def state(self):
+        """Name of the scene on top of the stack"""
+        return self.scene_stack[-1].name
+        
+    @state.setter
+    def state(self, name):
+        """Switch scenes by name
+
+        Returning to a scene already on the stack pops back to it,
+        overlays push on top, and any other scene replaces the stack.
+        """
+        scene = self.scenes[name]
+        if scene in self.scene_stack:
+            del self.scene_stack[self.scene_stack.index(scene) + 1:]
+        elif scene.overlay and self.scene_stack:
+            self.scene_stack.append(scene)
+        else:
+            self.scene_stack = [scene]
+        self.snapshot_valid = False
+        
+    def pop_scene(self):
+        """Close the top overlay"""
+        if len(self.scene_stack) > 1:
+            self.scene_stack.pop()
+            self.snapshot_valid = False
+            
+    def poll_events(self):
+        """Collect pending window events with the time they were polled
+
+        Injected events may carry their own perf_counter "time".
+        """
+        now = time.perf_counter()
+        return [(getattr(event, "time", now), event) for event in pygame.event.get()]
+        
+    def handle_events(self, events=None):
+        """Handle all input
+
+        events are (time, event) pairs from another poller; by default
+        SDL is polled into the input queue here.
+        """
+        if events is None:
+            self.input.poll()
+        else:
+            for polled, event in events:
+                self.input.push(polled, event)
+        self.frame_time = self.input.clock()
+        for polled, event in self.input.begin_frame():
             if event.type == pygame.QUIT:
                 return False
+            if event.type == pygame.KEYDOWN and self.input_time is None:
+                self.input_time = polled
                 
-            if event.type == pygame.KEYDOWN:
-                # Title screen
-                if self.state == "title":
-                    if event.key == pygame.K_z:
-                        self.state = "game"
-                        self._start_chapter1()
-                    elif event.key == pygame.K_x:
-                        return False
-                        
-                # Dialogue
-                elif self.state == "dialogue":
-                    if event.key == pygame.K_z:
-                        self.dialogue.advance()
-                        if not self.dialogue.box_open:
-                            self.state = "game"
-                            
-                # Game (overworld)
-                elif self.state == "game":
-                    if event.key == pygame.K_z:
-                        self._check_interaction()
-                    elif event.key == pygame.K_x:
-                        self.state = "menu"
-                    elif event.key == pygame.K_c:
-                        # Quick battle test
-                        self._start_battle(["Shroom Scout"])
-                        
-                # Battle
-                elif self.state == "battle":
-                    if event.key == pygame.K_z:
-                        if self.rhythm_battle.rhythm_active:
-                            multiplier = self.rhythm_battle.check_hit()
-                            # Apply damage with multiplier
-                        elif self.timed_battle.active_attack:
-                            multiplier = self.timed_battle.check_hit()
-                            # Apply damage
-                        else:
-                            # Select menu option
-                            self._battle_select()
-                    elif event.key == pygame.K_SPACE:
-                        # Rhythm hit check
-                        if self.rhythm_battle.rhythm_active:
-                            self.rhythm_battle.check_hit()
-                            
-                # Menu
-                elif self.state == "menu":
-                    if event.key == pygame.K_x:
-                        self.state = "game"
-                        
+        # Menus wait out screen transitions instead of acting on them blind
+        hold = self.scene_stack[-1].buffered and self.effects.transitioning
+        for press in self.input.take_presses(hold):
+            if not self.scene_stack[-1].handle_event(press):
+                return False
         return True
         
+    def _hit_feedback(self, multiplier):
+        """Flash the screen on PERFECT hits; enemies flinch or counter"""
+        if multiplier >= 2.0:
+            self.effects.flash()
+        self.battle_entities.play_all("hurt" if multiplier > 1.0 else "attack")
+            
     def update(self):
         """Update game state"""
-        # State-specific updates
-        if self.state == "game":
-            self._update_overworld()
-        elif self.state == "battle":
-            self._update_battle()
-        elif self.state == "dialogue":
-            self.dialogue.update()
-            
-        # Always update rhythm/timed battles
-        if self.rhythm_battle.rhythm_active:
-            self.rhythm_battle.update()
-        if self.timed_battle.active_attack:
-            self.timed_battle.update()
+        with self.profiler.section("update:cutscene"):
+            self.cutscene.update()
+            
+        scene = self.scene_stack[-1]
+        with self.profiler.section("update:" + scene.name):
+            scene.update()
+            
+        with self.profiler.section("update:systems"):
+            # Always update rhythm/timed battles
+            if self.rhythm_battle.rhythm_active:
+                self.rhythm_battle.update(self.frame_time)
+            if self.timed_battle.active_attack:
+                self.timed_battle.update(self.frame_time)
+            self.effects.update()
+            
+        with self.profiler.section("audio"):
+            self.synth.update()
             
     def _update_overworld(self):
         """Update overworld movement"""
-        keys = pygame.key.get_pressed()
+        if self.effects.transitioning:
+            return  # Frozen while the screen fades between maps
+            
+        held = self.input.held
         
         # Movement
         speed = 2
         old_pos = self.player_pos[:]
         
-        if keys[pygame.K_LEFT]:
+        if held(pygame.K_LEFT):
             self.player_pos[0] -= speed
             self.player_dir = "left"
-        if keys[pygame.K_RIGHT]:
+        if held(pygame.K_RIGHT):
             self.player_pos[0] += speed
             self.player_dir = "right"
-        if keys[pygame.K_UP]:
+        if held(pygame.K_UP):
             self.player_pos[1] -= speed
             self.player_dir = "up"
-        if keys[pygame.K_DOWN]:
+        if held(pygame.K_DOWN):
             self.player_pos[1] += speed
             self.player_dir = "down"
             
-        # Keep in bounds
-        self.player_pos[0] = max(0, min(GBA_WIDTH - 16, self.player_pos[0]))
-        self.player_pos[1] = max(0, min(GBA_HEIGHT - 16, self.player_pos[1]))
+        # Keep in bounds and off solid cells, axis by axis so walls slide
+        x = max(0, min(GBA_WIDTH - 16, self.player_pos[0]))
+        y = max(0, min(GBA_HEIGHT - 16, self.player_pos[1]))
+        fx, fy = FEET
+        if self.nav.is_walkable(old_pos[0] + fx, old_pos[1] + fy):
+            if not self.nav.is_walkable(x + fx, old_pos[1] + fy):
+                x = old_pos[0]
+            if not self.nav.is_walkable(x + fx, y + fy):
+                y = old_pos[1]
+        self.player_pos[:] = [x, y]
+        
+        # Walk cycle while moving, idle otherwise
+        action = "walk" if self.player_pos != old_pos else "idle"
+        if action != self.player_action:
+            self.player_action = action
+            self.player_clock = 0
+        self.player_clock += 1
         
-        # Random encounters
-        if random.random() < 0.002 and self.current_map == "dark_forest":
-            self._start_battle(["Shroom Scout"])
+        # Followers and chasers path toward the player
+        with self.profiler.section("update:nav"):
+            if self.party[1:] != list(self.followers):
+                self._spawn_followers()
+            self.nav.track("player", self.nav.cell(x + fx, y + fy))
+            self.nav.update()
+            self.npcs.update(nav=self.nav)
+            
+        # Chasers that reach the player start a battle
+        for i in self.chasers:
+            if math.hypot(*(self.npcs.pos[i] - (x, y))) < 10:
+                self.chasers.remove(i)
+                self.npcs.despawn(i)
+                self._start_battle([SHROOM_SCOUT])
+                return
             
         # Scene triggers
         self._check_scene_triggers()
         
     def _check_scene_triggers(self):
         """Check for story progression triggers"""
+        if self.cutscene.running:
+            return
+            
         # Chapter 1: School -> Dark World
         if self.chapter == 1 and self.scene == 0:
             if self.player_pos[0] > 200:
-                self.scene = 1
-                self._show_dialogue(
-                    "Joseph\nHuh? The supply room door is open...\n" +
-                    "Becca\nEveryone, stay close. We're going in."
-                )
-                self.current_map = "dark_forest"
-                self.player_pos = [30, 80]
+                self.cutscene.start("supply_room")
                 
         # First enemy encounter
-        elif self.chapter == 1 and self.scene == 1 and not self.story_flags["met_shroom"]:
+        elif self.chapter == 1 and self.scene == 1 and not self.flags & MET_SHROOM:
             if self.player_pos[0] > 100:
-                self.story_flags["met_shroom"] = True
-                self._show_dialogue(
-                    "Shroom Scout\nHalt! You trespass in the Dark World!\n" +
-                    "Joseph\nWe don't mean any harm!\n" +
-                    "Becca\nGet ready for battle!"
-                )
-                self._start_battle(["Shroom Scout"])
+                self.cutscene.start("meet_shroom")
                 
         # Goomba Sentinel boss
         elif self.chapter == 1 and self.scene == 1 and self.player_pos[0] > 180:
-            if not self.story_flags["beat_goomba_sentinel"]:
-                self._show_dialogue(
-                    "Goomba Sentinel\nI am the guardian of the First Gate!\n" +
-                    "Prove your worth, Lightners!"
-                )
-                self._start_battle(["Goomba Sentinel"])
+            if not self.flags & BEAT_GOOMBA_SENTINEL:
+                self.cutscene.start("goomba_sentinel")
                 
         # Trace joins after boss
-        elif (self.chapter == 1 and self.story_flags["beat_goomba_sentinel"] and 
-              not self.story_flags["trace_joined"]):
-            self.story_flags["trace_joined"] = True
-            self._show_dialogue(
-                "Trace\nThat was amazing! Can I join you?\n" +
-                "Becca\n...Alright. But stay close.\n" +
-                "Trace\nYES! Adventure time!"
-            )
-            self.party.append("Trace")
-            self.chapter = 2
-            self.current_map = "twilight_town"
-            self.player_pos = [30, 80]
+        elif (self.chapter == 1 and self.flags & BEAT_GOOMBA_SENTINEL and 
+              not self.flags & TRACE_JOINED):
+            self.cutscene.start("trace_joins")
             
         # Royal Koopa Brothers
-        elif self.chapter == 2 and not self.story_flags["met_royal_koopas"]:
+        elif self.chapter == 2 and not self.flags & MET_ROYAL_KOOPAS:
             if self.player_pos[0] > 150:
-                self.story_flags["met_royal_koopas"] = True
-                self._show_dialogue(
-                    "Royal Koopa Alpha\nHalt! Who approaches the Second Gate?\n" +
-                    "Royal Koopa Beta\nLightners! In our domain!\n" +
-                    "Joseph\nWe just want to pass through!"
-                )
-                self._start_battle(["Royal Koopa Alpha", "Royal Koopa Beta"])
+                self.cutscene.start("royal_koopas")
                 
         # Shadow Luigi
-        elif (self.chapter == 2 and self.story_flags["met_royal_koopas"] and
-              not self.story_flags["met_shadow_luigi"]):
+        elif (self.chapter == 2 and self.flags & MET_ROYAL_KOOPAS and
+              not self.flags & MET_SHADOW_LUIGI):
             if self.player_pos[0] > 200:
-                self.story_flags["met_shadow_luigi"] = True
-                self._show_dialogue(
-                    "Shadow Luigi\nYahoo! Finally, some fun visitors!\n" +
-                    "Let's play a game! Catch me if you can!"
-                )
-                self._start_battle(["Shadow Luigi"])
+                self.cutscene.start("shadow_luigi")
                 
         # Final Boss
-        elif (self.chapter == 2 and self.story_flags["met_shadow_luigi"] and
-              not self.story_flags["beat_final_boss"]):
+        elif (self.chapter == 2 and self.flags & MET_SHADOW_LUIGI and
+              not self.flags & BEAT_FINAL_BOSS):
             if self.player_pos[0] > 220:
-                self.story_flags["beat_final_boss"] = True
-                self._show_dialogue(
-                    "Bowser Lord of Embers\nSo. The Lightners have come at last.\n" +
-                    "I am the seal. The guardian.\n" +
-                    "If I fall... everything ends."
-                )
-                self._start_battle(["Bowser Lord of Embers"])
+                self.cutscene.start("final_boss")
                 
     def _start_battle(self, enemies):
         """Start a battle"""
         self.state = "battle"
         self.in_battle = True
+        self.assets.enter_scope("battle")
         self.battle_enemies = enemies
         self.battle_turn = 0
         self.battle_menu = 0
+        self.effects.mosaic_in()
+        
+        # Line up the enemy formation
+        self.battle_entities.clear()
+        for i, enemy in enumerate(enemies):
+            kind = ENEMIES[enemy]
+            if kind.sprite:
+                self.battle_entities.spawn(kind.sprite, 80 + i * 60, kind.y,
+                                           state=EntityStore.IDLE)
         
-        # Start rhythm or timed battle based on enemy
-        if "Shroom Scout" in enemies:
-            self.rhythm_battle.start_pattern("default")
-        elif "Goomba Sentinel" in enemies:
-            self.rhythm_battle.start_pattern("boss")
-        elif "Royal Koopa" in enemies:
-            self.timed_battle.start_attack("hammer")
-        elif "Shadow Luigi" in enemies:
-            self.rhythm_battle.start_pattern("fast")
-        elif "Bowser" in enemies:
-            self.timed_battle.start_attack("special")
+        # The lead enemy picks the rhythm or timed battle
+        lead = ENEMIES[enemies[0]]
+        if lead.system == "rhythm":
+            self.rhythm_battle.start_pattern(lead.pattern, self.frame_time)
+        else:
+            self.timed_battle.start_attack(lead.pattern, self.frame_time)
             
     def _update_battle(self):
         """Update battle logic"""
+        # Idle enemies breathe and one-shot hurt/attack frames fall back
+        self.battle_entities.update()
+        
         # Check if battle is over
         if not self.rhythm_battle.rhythm_active and not self.timed_battle.active_attack:
             # Enemy defeated
-            enemy = self.battle_enemies[0]
-            if "Goomba Sentinel" in enemy:
-                self.story_flags["beat_goomba_sentinel"] = True
-            elif "Bowser" in enemy:
-                self.story_flags["beat_final_boss"] = True
-                self._show_ending()
-                
             self.state = "game"
             self.in_battle = False
+            self.assets.leave_scope("battle")
+            
+            lead = ENEMIES[self.battle_enemies[0]]
+            self.flags |= lead.defeat_flag
+            if lead.defeat_cutscene:
+                self.cutscene.start(lead.defeat_cutscene)
             
     def _battle_select(self):
         """Handle battle menu selection"""
@@ -857,101 +3504,123 @@ class TFDeltaRuneGBA:
         """Check for interactions in overworld"""
         # Check NPCs, items, etc.
         if self.current_map == "school" and self.player_pos[0] > 200:
-            self._show_dialogue("Becca\nJoseph! Over here!\nThe supply room looks suspicious...")
+            self.cutscene.start("becca_hint")
             
-    def _show_dialogue(self, text):
-        """Show dialogue and switch to dialogue state"""
+    def _show_dialogue(self, pages):
+        """Show (speaker, line) pages and switch to dialogue state"""
         self.state = "dialogue"
-        self.dialogue.show(text)
+        self.dialogue.show_pages(pages)
         
     def _start_chapter1(self):
         """Start Chapter 1 story"""
-        self._show_dialogue(
-            "TF!DELTARUNE\nChapters 1+2\n\n" +
-            "Threshold Academy\nMonday Morning\n\n" +
-            "Joseph\nAnother ordinary day...\n" +
-            "Or so I thought."
-        )
-        
-    def _show_ending(self):
-        """Show game ending"""
-        self._show_dialogue(
-            "Bowser Lord of Embers\n...You showed me mercy.\n" +
-            "After all I've done... why?\n\n" +
-            "Joseph\nBecause everyone deserves a second chance.\n\n" +
-            "Becca\nThe Dark World is safe now.\n" +
-            "And so are we.\n\n" +
-            "Trace\nThat was the BEST adventure ever!\n\n" +
-            "THE END\n\nThanks for playing!\nTeam Flames ♡"
-        )
+        self.assets.enter_scope("chapter:1")
+        self._change_map("school", self.player_pos)
+        self.cutscene.start("intro")
         
     def draw(self):
-        """Draw everything"""
-        self.screen.fill(BLACK)
-        
-        if self.state == "title":
-            self._draw_title()
-        elif self.state == "game":
-            self._draw_overworld()
-        elif self.state == "battle":
-            self._draw_battle()
-        elif self.state == "dialogue":
-            self._draw_overworld()
-            self.dialogue.draw(self.screen)
-        elif self.state == "menu":
-            self._draw_menu()
-            
-        pygame.display.flip()
+        """Record this frame's render list, then present or publish it"""
+        self.canvas = RenderList()
+        with self.profiler.section("draw:" + self.state):
+            self._draw_scene(len(self.scene_stack) - 1)
+        render = RenderFrame(self.frame_number, self.canvas.freeze(),
+                             self.effects.levels(), self.input_time)
+        self.frame_number += 1
+        self.input_time = None
+        
+        if self.threaded:
+            self.pipeline.publish(render)
+        else:
+            self.present(render)
+        self.profiler.end_frame()
+        
+    def present(self, render):
+        """Rasterize a render frame, apply effects, scale and flip"""
+        profiler = self.present_profiler
+        with profiler.section("raster"):
+            self._rasterize(render.ops, self.frame)
+            
+        with profiler.section("effects"):
+            self.effects.apply(self.frame, render.effects)
+            
+        with profiler.section("present"):
+            self.upscaler.present(self.frame, self.screen)
+            pygame.display.flip()
+        if self.capture:
+            self.capture.grab(render.number, self.screen)
+        self.present_stats.flipped(render)
+        if self.threaded:
+            profiler.end_frame()
+            
+    def _rasterize(self, ops, surface, depth=0):
+        """Replay render list ops onto a surface"""
+        for func, args in ops:
+            if func is LAYER:
+                surface.blit(self._layer(depth, *args), (0, 0))
+            else:
+                func(surface, *args)
+                
+    def _layer(self, depth, ops, dim):
+        """Rasterize the scene under an overlay once and reuse it"""
+        if depth == len(self.layers):
+            self.layers.append([None, self.frame.copy()])
+        cached = self.layers[depth]
+        if cached[0] is not ops:
+            self._rasterize(ops, cached[1], depth + 1)
+            if dim:
+                self.effects.dim(cached[1])
+            cached[0] = ops
+        return cached[1]
+        
+    def _draw_scene(self, index):
+        """Record a stack entry, reusing the frozen snapshot under overlays"""
+        scene = self.scene_stack[index]
+        if scene.overlay and index > 0:
+            if not self.snapshot_valid:
+                canvas, self.canvas = self.canvas, RenderList()
+                self._draw_scene(index - 1)
+                self.snapshot = self.canvas.freeze()
+                self.canvas = canvas
+                self.snapshot_valid = True
+            self.canvas.layer(self.snapshot, scene.dim_below)
+        else:
+            self.canvas.fill(BLACK)
+        scene.draw(self.canvas)
         
     def _draw_title(self):
         """Draw title screen"""
         # Title
-        title = self.title_font.render("TF!DELTARUNE", True, PURPLE)
-        title_rect = title.get_rect(center=(SCREEN_WIDTH//2, 60))
-        self.screen.blit(title, title_rect)
+        self.title_font.draw_centered(self.canvas, "TF!DELTARUNE",
+                                      (GBA_WIDTH//2, 20), PURPLE)
         
-        subtitle = self.font.render("GBA Edition - Chapters 1+2", True, YELLOW)
-        sub_rect = subtitle.get_rect(center=(SCREEN_WIDTH//2, 100))
-        self.screen.blit(subtitle, sub_rect)
+        self.font.draw_centered(self.canvas, "GBA Edition - Chapters 1+2",
+                                (GBA_WIDTH//2, 33), YELLOW)
         
         # Party showcase
-        y = 150
+        y = 50
         for i, member in enumerate(["Joseph", "Becca", "Trace", "Gave", "John", "Summer"]):
             color = [BLUE, PURPLE, YELLOW, GREEN, RED, CYAN][i]
-            text = self.font.render(member, True, color)
-            self.screen.blit(text, (50 + (i % 3) * 200, y + (i // 3) * 40))
+            self.font.draw(self.canvas, member,
+                           (17 + (i % 3) * 67, y + (i // 3) * 13), color)
             
         # Start prompt
-        prompt = self.font.render("Press Z to Start  |  X to Quit", True, WHITE)
-        prompt_rect = prompt.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 50))
-        self.screen.blit(prompt, prompt_rect)
+        self.font.draw_centered(self.canvas, "Press Z to Start | X to Quit",
+                                (GBA_WIDTH//2, GBA_HEIGHT - 17), WHITE)
         
     def _draw_overworld(self):
         """Draw overworld map"""
         # Draw map background based on current location
-        if self.current_map == "school":
-            self.screen.fill((60, 60, 80))
-            # Draw simple school layout
-            pygame.draw.rect(self.screen, BROWN,
-                           (200 * SCALE, 50 * SCALE, 40 * SCALE, 100 * SCALE))
-        elif self.current_map == "dark_forest":
-            self.screen.fill((20, 30, 20))
-            # Draw trees
-            for x in range(0, GBA_WIDTH, 40):
-                pygame.draw.rect(self.screen, ENEMY_GREEN,
-                               (x * SCALE, 50 * SCALE, 10 * SCALE, 30 * SCALE))
-        elif self.current_map == "twilight_town":
-            self.screen.fill((40, 30, 50))
-            # Draw buildings
-            pygame.draw.rect(self.screen, PURPLE,
-                           (100 * SCALE, 60 * SCALE, 40 * SCALE, 60 * SCALE))
+        if self.assets.has("map", self.current_map):
+            self.canvas.blit(self.assets.get("map", self.current_map), (0, 0))
                            
-        # Draw player
-        sprite_key = self.party[0].lower() if self.party else "joseph"
+        # Draw NPCs and the player in Y order
+        player = []
+        sprite_key = MEMBERS[self.party[0] if self.party else JOSEPH][1]
         if sprite_key in self.sprites:
-            self.sprites[sprite_key].draw(self.screen,
-                                        self.player_pos[0] * SCALE,
-                                        self.player_pos[1] * SCALE)
+            sheet = self.sprites[sprite_key].sheet or self.sprites[sprite_key].bake_sheet()
+            player.append((sheet.surface, tuple(self.player_pos),
+                           sheet.frame(self.player_action, self.player_dir,
+                                       self.player_clock)))
+        self.npcs.draw(self.canvas, self.sprites, extra=player)
                                         
         # Draw HUD
         self._draw_hud()
@@ -959,30 +3628,22 @@ class TFDeltaRuneGBA:
     def _draw_battle(self):
         """Draw battle screen"""
         # Background
-        self.screen.fill((10, 10, 30))
+        self.canvas.fill((10, 10, 30))
         
         # Draw enemies
-        enemy_x = 80
-        for enemy in self.battle_enemies:
-            if "shroom" in enemy.lower():
-                self.sprites["shroom"].draw(self.screen, enemy_x * SCALE, 40 * SCALE)
-            elif "goomba" in enemy.lower():
-                self.sprites["goomba"].draw(self.screen, enemy_x * SCALE, 30 * SCALE)
-            enemy_x += 60
+        self.battle_entities.draw(self.canvas, self.sprites)
             
         # Draw party status
-        y = 120 * SCALE
+        y = 120
         for member in self.party:
-            if member in self.stats:
-                stats = self.stats[member]
-                hp_text = f"{member}: HP {stats['hp']}/{stats['max_hp']}"
-                text = self.font.render(hp_text, True, WHITE)
-                self.screen.blit(text, (10 * SCALE, y))
-                y += 25 * SCALE
+            stats = self.stats[member]
+            hp_text = f"{MEMBERS[member][0]}: HP {stats.hp}/{stats.max_hp}"
+            self.font.draw(self.canvas, hp_text, (10, y), WHITE)
+            y += 25
                 
         # Draw rhythm/timed battle UI
-        self.rhythm_battle.draw(self.screen)
-        self.timed_battle.draw(self.screen)
+        self.rhythm_battle.draw(self.canvas)
+        self.timed_battle.draw(self.canvas)
         
         # Draw battle menu if no active rhythm/timed
         if not self.rhythm_battle.rhythm_active and not self.timed_battle.active_attack:
@@ -991,13 +3652,13 @@ class TFDeltaRuneGBA:
     def _draw_battle_menu(self):
         """Draw battle action menu"""
         menu_items = ["FIGHT", "ACT", "MAGIC", "MERCY"]
-        x = 10 * SCALE
-        y = 100 * SCALE
+        x = 10
+        y = 100
         
         for i, item in enumerate(menu_items):
             color = YELLOW if i == self.battle_menu else WHITE
-            text = self.font.render(item, True, color)
-            self.screen.blit(text, (x + (i % 2) * 100 * SCALE, y + (i // 2) * 30 * SCALE))
+            self.font.draw(self.canvas, item,
+                           (x + (i % 2) * 100, y + (i // 2) * 30), color)
             
     def _draw_hud(self):
         """Draw overworld HUD"""
@@ -1008,49 +3669,834 @@ class TFDeltaRuneGBA:
             "twilight_town": "Twilight Town"
         }
         loc = loc_names.get(self.current_map, "Unknown")
-        loc_text = self.font.render(loc, True, CYAN)
-        self.screen.blit(loc_text, (10 * SCALE, 10 * SCALE))
+        self.font.draw(self.canvas, loc, (10, 10), CYAN)
         
         # Chapter indicator
-        chap_text = self.font.render(f"Chapter {self.chapter}", True, YELLOW)
-        self.screen.blit(chap_text, (SCREEN_WIDTH - 100 * SCALE, 10 * SCALE))
+        chapter = f"Chapter {self.chapter}"
+        self.font.draw(self.canvas, chapter,
+                       (GBA_WIDTH - self.font.size(chapter)[0] - 10, 10), YELLOW)
         
     def _draw_menu(self):
         """Draw pause menu"""
-        # Semi-transparent overlay
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(128)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
-        
         # Menu box
-        box = pygame.Rect(50 * SCALE, 40 * SCALE, 140 * SCALE, 80 * SCALE)
-        pygame.draw.rect(self.screen, DARK_GRAY, box)
-        pygame.draw.rect(self.screen, WHITE, box, 2)
+        box = pygame.Rect(50, 40, 140, 80)
+        self.canvas.rect(DARK_GRAY, box)
+        self.canvas.rect(WHITE, box, 1)
         
         # Menu options
         options = ["Items", "Status", "Save", "Quit"]
-        y = box.y + 20
+        y = box.y + 7
         for i, opt in enumerate(options):
-            text = self.font.render(opt, True, WHITE)
-            self.screen.blit(text, (box.x + 20, y + i * 25 * SCALE))
+            self.font.draw(self.canvas, opt, (box.x + 7, y + i * 18), WHITE)
             
     def run(self):
         """Main game loop"""
-        running = True
-        while running:
-            running = self.handle_events()
-            self.update()
-            self.draw()
-            self.clock.tick(60)  # GBA ran at 60fps!
-            
+        if self.threaded:
+            self._run_pipelined()
+        elif self.use_asyncio:
+            asyncio.run(self._run_async())
+        else:
+            running = True
+            next_frame = time.perf_counter()
+            while running:
+                running = self.handle_events()
+                self.update()
+                self.draw()
+                self._startup_step()
+                # GBA ran at 60fps! Input is polled while we wait
+                next_frame = max(next_frame + FRAME_SECONDS, time.perf_counter())
+                self.input.wait(next_frame)
+                
         pygame.quit()
+        
+    async def _run_async(self):
+        """Frame task of the asyncio loop
+
+        Each frame runs to completion, then the scheduler hands the idle
+        time before the next 60 Hz deadline to background jobs.
+        """
+        scheduler = self.scheduler
+        scheduler.running = True
+        next_frame = time.perf_counter()
+        poller = asyncio.get_running_loop().create_task(self._poll_input())
+        try:
+            running = True
+            while running:
+                scheduler.frame_started(next_frame)
+                running = self.handle_events()
+                self.update()
+                self.draw()
+                self._startup_step()
+                # Overran frames restart the schedule instead of catching up
+                next_frame = max(next_frame + scheduler.period, time.perf_counter())
+                await scheduler.idle(next_frame)
+        finally:
+            poller.cancel()
+            scheduler.running = False
+            scheduler.cancel_all()
+            
+    async def _poll_input(self):
+        """Poll input at poll_hz between frames of the asyncio loop"""
+        if self.input.poll_interval is None:
+            return
+        while True:
+            await asyncio.sleep(self.input.poll_interval)
+            self.input.poll()
+            
+    def _run_pipelined(self):
+        """Simulate on a worker thread while this thread presents
+
+        SDL expects event polling and flips on the thread that opened the
+        window, so the main thread is the presentation thread: it polls
+        input for the simulation and rasterizes the latest render list.
+        """
+        self.finish_startup()       # Stages touch state the simulation thread reads
+        self.running = True
+        simulation = threading.Thread(target=self._simulate, daemon=True)
+        simulation.start()
+        while self.running:
+            self.inputs.extend(self.poll_events())
+            render = self.pipeline.take(timeout=0.002)
+            if render is not None:
+                self.present(render)
+        simulation.join()
+        if self.simulation_error:
+            raise self.simulation_error
+            
+    def _simulate(self):
+        """Simulation thread: input, update and record at 60 Hz"""
+        try:
+            while self.running:
+                events = [self.inputs.popleft() for _ in range(len(self.inputs))]
+                if not self.handle_events(events):
+                    break
+                self.update()
+                self.draw()
+                self.clock.tick(60)
+        except Exception as error:
+            self.simulation_error = error
+        finally:
+            self.running = False
+
+# ============================================================================
+# BENCHMARK SUITE (Headless timings, JSON results, baseline regressions)
+# ============================================================================
+
+BENCH_THRESHOLD = 0.25      # Allowed median slowdown vs baseline (25%)
+BENCHMARKS = {}             # case name -> setup(game) returning a step callable
+
+def headless():
+    """Route SDL to dummy video/audio drivers (no display or sound card)"""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+def bench_case(name):
+    """Register a benchmark; the decorated setup returns the step to time"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+@bench_case("sprite.draw x100")
+def _bench_sprite_draw(game):
+    sprite = GBASprite(16, 16).create_character("joseph", BLUE)
+    sprite.bake()
+    def step():
+        for i in range(100):
+            sprite.draw(game.frame, (i * 7) % (GBA_WIDTH - 16), (i * 13) % (GBA_HEIGHT - 16))
+    return step
+
+@bench_case("sprite.create_character")
+def _bench_create_character(game):
+    def step():
+        GBASprite(16, 16).create_character("joseph", BLUE).bake()
+        GBASprite(24, 24).create_character("shroom", ENEMY_BROWN).bake()
+    return step
+
+def _recorded(game, draw):
+    """Step that records a draw call and rasterizes it to the frame"""
+    def step():
+        canvas = RenderList()
+        draw(canvas)
+        game._rasterize(canvas.freeze(), game.frame)
+    return step
+
+@bench_case("dialogue.draw long")
+def _bench_dialogue_draw(game):
+    dialogue = GBADialogue(game.dialogue_font, game.font)
+    dialogue.show_pages([("Becca", "The Dark World stretches on and on, " * 8)])
+    dialogue.advance()  # Reveal the whole page
+    return _recorded(game, dialogue.draw)
+
+def _heavy_rhythm(game, effects=200):
+    rhythm = RhythmBattle(game.synth, game.font)
+    rhythm.start_pattern("boss")
+    for circle in rhythm.beat_circles:
+        circle['active'] = True
+        circle['radius'] = 12
+    rhythm.combo = 42
+    rhythm.hit_effects = [{
+        'x': (i * 37) % 200, 'y': 20 + (i * 11) % 120,
+        'text': "PERFECT!" if i % 2 else "GOOD!",
+        'color': YELLOW if i % 2 else GREEN,
+        'timer': 10 ** 9
+    } for i in range(effects)]
+    return rhythm
+
+@bench_case("font.draw 1200 glyphs")
+def _bench_font_draw(game):
+    font = game.font
+    line = "THE DARK WORLD STRETCHES ON AND ON. "[:GBA_WIDTH // font.advance]
+    def step():
+        for row in range(40):
+            font.draw(game.frame, line, (0, (row * font.height) % GBA_HEIGHT), YELLOW)
+    return step
+
+@bench_case("rhythm.update heavy")
+def _bench_rhythm_update(game):
+    rhythm = _heavy_rhythm(game)
+    def step():
+        rhythm.pattern_index = 0   # Never reach the end of the pattern
+        rhythm.update()
+    return step
+
+@bench_case("rhythm.draw heavy")
+def _bench_rhythm_draw(game):
+    rhythm = _heavy_rhythm(game)
+    return _recorded(game, rhythm.draw)
+
+def _bench_generator(generate):
+    return lambda game: lambda: generate(game.synth)
+
+for _name, _generate in {
+    "square": lambda synth: synth._generate_square_wave(440, 0.1, 0.3),
+    "sine": lambda synth: synth._generate_sine_wave([523, 659, 784], 0.3, 0.5),
+    "noise": lambda synth: synth._generate_noise(0.2, 0.5),
+    "fire": lambda synth: synth._generate_fire_sound(),
+    "ice": lambda synth: synth._generate_ice_sound(),
+    "lightning": lambda synth: synth._generate_lightning_sound(),
+}.items():
+    bench_case("synth." + _name)(_bench_generator(_generate))
+
+@bench_case("mixer.mix full pool")
+def _bench_mixer(game):
+    mixer = game.synth.mixer
+    wave = game.synth._generate_sine_wave([1046, 1318], 1.0, 0.6)
+    def step():
+        for v in range(mixer.voices):
+            mixer.play(wave, 0.5, pan=v / mixer.voices - 0.5, pitch=1 + v / 10, priority=3)
+        mixer.mix()
+    return step
+
+@bench_case("nav.astar forest")
+def _bench_astar(game):
+    nav = NavGrid(MAP_OBSTACLES["dark_forest"])
+    start, goal = nav.cell(0, 0), nav.cell(GBA_WIDTH - 1, GBA_HEIGHT - 1)
+    return lambda: nav.find_path(start, goal)
+
+@bench_case("nav.flow_field rebuild")
+def _bench_flow_field(game):
+    nav = NavGrid(MAP_OBSTACLES["dark_forest"])
+    cells = [nav.cell(8, 150), nav.cell(230, 150)]
+    def step():
+        field = nav.track("player", cells[0])
+        while field.pending:
+            field.expand(nav.size)
+        cells.reverse()
+    return step
+
+@bench_case("entities.path 200")
+def _bench_pathing(game):
+    nav = NavGrid(MAP_OBSTACLES["dark_forest"])
+    field = nav.track("player", nav.cell(120, 150))
+    field.expand(nav.size)
+    store = EntityStore(seed=0)
+    rng = random.Random(0)
+    for _ in range(200):
+        store.spawn("npc", rng.uniform(0, GBA_WIDTH - 16), rng.uniform(0, 40),
+                    state=EntityStore.PATH, speed=0.6)
+    return lambda: store.update(nav=nav)
+
+@bench_case("game.check_scene_triggers")
+def _bench_scene_triggers(game):
+    # Late chapter 2 with every beat done: walks the whole trigger chain
+    game.chapter = 2
+    game.player_pos = [10, 80]
+    game.flags = (1 << len(FLAGS)) - 1 & ~BEAT_FINAL_BOSS
+    return game._check_scene_triggers
+
+def _bench_frame(state):
+    def setup(game):
+        game.state = "title"
+        if state != "title":
+            game._enter_map("dark_forest", (60, 80))
+            game.state = "game"
+        if state == "battle":
+            game._start_battle([SHROOM_SCOUT])
+        elif state == "dialogue":
+            game._show_dialogue([("Joseph", "Where are we? This forest feels wrong.")])
+            game.dialogue.advance()
+        elif state != "game":
+            game.state = state
+        game.effects = ScreenEffects(profiler=game.profiler)   # No transitions
+        return game.draw
+    return setup
+
+for _state in SCENES:
+    bench_case("frame." + _state)(_bench_frame(_state))
+
+def run_benchmarks(names=None, repeat=50, warmup=5):
+    """Time each case in a fresh headless game
+
+    Returns {name: {"median_ms", "mean_ms", "min_ms", "p95_ms", "runs"}},
+    plus "glyphs_per_sec" for cases that blit text straight to a surface.
+    """
+    headless()
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if names and not any(pattern in name for pattern in names):
+            continue
+        random.seed(0)
+        np.random.seed(0)
+        game = TFDeltaRuneGBA()
+        step = setup(game)
+        for _ in range(warmup):
+            step()
+        game.font.reset_stats()
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            step()
+            times.append(1000 * (time.perf_counter() - start))
+        times.sort()
+        results[name] = {
+            "median_ms": times[len(times) // 2],
+            "mean_ms": sum(times) / len(times),
+            "min_ms": times[0],
+            "p95_ms": times[min(len(times) - 1, int(len(times) * 0.95))],
+            "runs": repeat,
+        }
+        if game.font.glyphs_drawn:
+            results[name]["glyphs_per_sec"] = game.font.glyphs_per_sec()
+    pygame.quit()
+    return results
+
+def compare_benchmarks(results, baseline, thresholds=None):
+    """Compare median times against a baseline
+
+    thresholds maps case names to allowed slowdown fractions, with "*" as
+    the default. Returns a list of (name, baseline_ms, ms, ratio, status)
+    where status is "ok", "REGRESSION", "new" or "missing".
+    """
+    thresholds = thresholds or {}
+    default = thresholds.get("*", BENCH_THRESHOLD)
+    rows = []
+    for name in sorted(set(results) | set(baseline)):
+        if name not in baseline:
+            rows.append((name, None, results[name]["median_ms"], None, "new"))
+        elif name not in results:
+            rows.append((name, baseline[name]["median_ms"], None, None, "missing"))
+        else:
+            before = baseline[name]["median_ms"]
+            after = results[name]["median_ms"]
+            ratio = after / before if before else 1.0
+            limit = 1 + thresholds.get(name, default)
+            rows.append((name, before, after, ratio,
+                         "REGRESSION" if ratio > limit else "ok"))
+    return rows
+
+def bench_report(results):
+    """Machine-readable benchmark results with environment info"""
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "system": platform.system(),
+        },
+        "results": results,
+    }
+
+def parse_thresholds(specs):
+    """Parse ["0.3", "frame.battle=0.5"] into {"*": 0.3, "frame.battle": 0.5}"""
+    thresholds = {}
+    for spec in specs or []:
+        name, _, value = spec.rpartition("=")
+        thresholds[name or "*"] = float(value)
+    return thresholds
+
+def measure_pipeline(seconds=5.0, press_ms=100):
+    """Play headless in the single-threaded and pipelined modes
+
+    A helper thread presses Z every press_ms, stamping each press so the
+    latency includes time spent queued before the game polls it. Returns
+    {mode: PresentStats summary plus simulated FPS and frames dropped in
+    the hand-off}.
+    """
+    headless()
+    
+    def press(done):
+        while not done.wait(press_ms / 1000):
+            pygame.event.post(pygame.event.Event(
+                pygame.KEYDOWN, key=pygame.K_z, time=time.perf_counter()))
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+        
+    results = {}
+    for mode, threaded in (("sync", False), ("threaded", True)):
+        random.seed(0)
+        game = TFDeltaRuneGBA(threaded=threaded)
+        done = threading.Event()
+        presser = threading.Thread(target=press, args=(done,), daemon=True)
+        threading.Timer(seconds, done.set).start()
+        start = time.perf_counter()
+        presser.start()
+        game.run()
+        elapsed = time.perf_counter() - start
+        presser.join()
+        result = game.present_stats.summary()
+        result["sim_fps"] = game.frame_number / elapsed
+        result["dropped"] = game.pipeline.dropped
+        results[mode] = result
+    return results
+
+# ============================================================================
+# PLAYTEST BOTS (Headless story runs across all cores)
+# ============================================================================
+
+FRAME_BUDGET_MS = 1000 / 60
+FRAME_BINS_MS = (1, 2, 4, 8, FRAME_BUDGET_MS, 2 * FRAME_BUDGET_MS)
+REPEATABLE_CUTSCENES = {"becca_hint", "ending"}
+STALL_FRAMES = 60 * 60      # A minute of play without story progress
+
+class PlaytestAgent:
+    """Seeded bot that plays through handle_events-level key events
+
+    It reads the scene on top of the stack like a player reads the
+    screen: mashes Z through title and dialogue, holds arrow keys in the
+    overworld (biased right, where the story triggers are), and taps Z or
+    SPACE in battle. Menus and debug battles are opened now and then.
+    """
+    
+    MOVES = (pygame.K_RIGHT, pygame.K_RIGHT, pygame.K_RIGHT,
+             pygame.K_LEFT, pygame.K_UP, pygame.K_DOWN)
+    
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.held = None
+        self.hold_frames = 0
+        
+    def act(self, game):
+        """Key events for this frame as (time, event) pairs"""
+        now = game.input.clock()
+        events = []
+        
+        def key(kind, key):
+            events.append((now, pygame.event.Event(kind, key=key)))
+            
+        state = game.state
+        if state != "game" and self.held is not None:
+            key(pygame.KEYUP, self.held)
+            self.held = None
+            
+        rng = self.rng
+        if state in ("title", "dialogue"):
+            if rng.random() < 0.2:
+                key(pygame.KEYDOWN, pygame.K_z)
+        elif state == "menu":
+            if rng.random() < 0.1:
+                key(pygame.KEYDOWN, pygame.K_x)
+        elif state == "battle":
+            if rng.random() < 0.1:
+                key(pygame.KEYDOWN, rng.choice((pygame.K_z, pygame.K_SPACE)))
+        elif state == "game":
+            self.hold_frames -= 1
+            if self.hold_frames <= 0:
+                if self.held is not None:
+                    key(pygame.KEYUP, self.held)
+                self.held = rng.choice(self.MOVES)
+                self.hold_frames = rng.randint(10, 90)
+                key(pygame.KEYDOWN, self.held)
+            roll = rng.random()
+            if roll < 0.01:
+                key(pygame.KEYDOWN, pygame.K_z)
+            elif roll < 0.012:
+                key(pygame.KEYDOWN, pygame.K_x)
+            elif roll < 0.013:
+                key(pygame.KEYDOWN, pygame.K_c)
+        return events
+        
+    def play_frame(self, game):
+        """Feed this frame's keys to the game, then update and draw it"""
+        game.handle_events(self.act(game))
+        game.update()
+        game.draw()
+
+def seeded_game(seed, **options):
+    """Headless game and bot seeded so the run replays frame for frame
+
+    Key presses are judged against frame time rather than the wall clock.
+    """
+    headless()
+    random.seed(seed)
+    np.random.seed(seed)
+    game = TFDeltaRuneGBA(**options)
+    game.input.clock = lambda: game.frame_number * FRAME_SECONDS
+    return game, PlaytestAgent(seed)
+
+def _progress(game):
+    """Everything that counts as story progress"""
+    return (game.chapter, game.scene, game.current_map,
+            game.flags)
+
+def run_playtest(seed, frames=20000):
+    """Play one seeded headless run; returns a JSON-friendly result dict"""
+    game, agent = seeded_game(seed)
+    result = {"seed": seed, "frames": 0, "finished": False,
+              "soft_locks": [], "crash": None,
+              "histogram": [0] * (len(FRAME_BINS_MS) + 1), "slowest": []}
+    result["flags"] = dict.fromkeys(FLAGS)   # flag -> first frame set
+    progress = _progress(game)
+    last_progress = 0
+    slowest = []    # min-heap of (ms, frame, state)
+    try:
+        for frame in range(frames):
+            start = time.perf_counter()
+            state = game.state
+            agent.play_frame(game)
+            ms = 1000 * (time.perf_counter() - start)
+            result["frames"] = frame + 1
+            
+            result["histogram"][bisect.bisect_left(FRAME_BINS_MS, ms)] += 1
+            if len(slowest) < 5:
+                heapq.heappush(slowest, (ms, frame, state))
+            else:
+                heapq.heappushpop(slowest, (ms, frame, state))
+                
+            for flag in flag_names(game.flags):
+                if result["flags"][flag] is None:
+                    result["flags"][flag] = frame
+            if _progress(game) != progress:
+                progress = _progress(game)
+                last_progress = frame
+            if game.flags & BEAT_FINAL_BOSS and not game.cutscene.running:
+                result["finished"] = True
+                break
+    except Exception as error:
+        result["crash"] = f"{type(error).__name__}: {error} (frame {result['frames']})"
+        
+    for label, count in game.cutscene.starts.items():
+        if count > 1 and label not in REPEATABLE_CUTSCENES:
+            result["soft_locks"].append(f"cutscene '{label}' triggered {count} times")
+    if not result["finished"] and result["frames"] - last_progress >= STALL_FRAMES:
+        result["soft_locks"].append(
+            f"no progress for {result['frames'] - last_progress} frames: chapter "
+            f"{game.chapter} scene {game.scene} on {game.current_map} at "
+            f"{tuple(game.player_pos)} in '{game.state}'")
+    result["slowest"] = [{"ms": ms, "frame": frame, "state": state}
+                         for ms, frame, state in sorted(slowest, reverse=True)]
+    pygame.quit()
+    return result
+
+def _run_playtest(job):
+    return run_playtest(*job)
+
+def run_playtests(runs=8, frames=20000, jobs=None, first_seed=0):
+    """Run seeded playtests in parallel, one process per core by default"""
+    seeds = [(seed, frames) for seed in range(first_seed, first_seed + runs)]
+    with multiprocessing.Pool(jobs or os.cpu_count()) as pool:
+        return pool.map(_run_playtest, seeds)
+
+def playtest_report(results):
+    """Aggregate playtest runs into coverage, soft-locks and frame costs"""
+    runs = len(results)
+    histogram = [sum(r["histogram"][i] for r in results)
+                 for i in range(len(FRAME_BINS_MS) + 1)]
+    slowest = sorted((dict(frame, seed=r["seed"]) for r in results for frame in r["slowest"]),
+                     key=lambda frame: -frame["ms"])[:10]
+    return {
+        "runs": runs,
+        "finished": sum(r["finished"] for r in results),
+        "unfinished": [r["seed"] for r in results if not r["finished"]],
+        "coverage": {flag: sum(r["flags"][flag] is not None for r in results) / runs
+                     for flag in results[0]["flags"]},
+        "soft_locks": {r["seed"]: r["soft_locks"] for r in results if r["soft_locks"]},
+        "crashes": {r["seed"]: r["crash"] for r in results if r["crash"]},
+        "over_budget": sum(histogram[FRAME_BINS_MS.index(FRAME_BUDGET_MS) + 1:]),
+        "histogram": dict(zip([f"<{ms:.1f}ms" for ms in FRAME_BINS_MS] + ["slower"],
+                              histogram)),
+        "slowest": slowest,
+        "results": results,
+    }
+
+def print_playtest_report(report):
+    print(f"Playtest: {report['finished']}/{report['runs']} runs reached the ending")
+    if report["unfinished"]:
+        print(f"  did not finish: seeds "
+              f"{', '.join(map(str, report['unfinished']))}")
+    print("Story flag coverage:")
+    for flag, share in report["coverage"].items():
+        print(f"  {flag:<24} {100 * share:5.1f}%")
+    for title, issues in (("Soft-locks", report["soft_locks"]),
+                          ("Crashes", report["crashes"])):
+        if issues:
+            print(f"{title}:")
+            for seed, issue in issues.items():
+                for line in issue if isinstance(issue, list) else [issue]:
+                    print(f"  seed {seed}: {line}")
+    print(f"Frame times ({report['over_budget']} over the 60 FPS budget):")
+    for label, count in report["histogram"].items():
+        print(f"  {label:<10} {count}")
+    print("Slowest frames:")
+    for frame in report["slowest"]:
+        print(f"  {frame['ms']:7.2f} ms  seed {frame['seed']} frame {frame['frame']} "
+              f"({frame['state']})")
+
+# ============================================================================
+# VISUAL REGRESSION (Headless frame capture + golden image diffs)
+# ============================================================================
+
+# Frames of the seeded (seed 0) bot run compared against goldens by
+# default; they cover the title, dialogue, battles and two overworld maps
+CAPTURE_FRAMES = (0, 20, 90, 300, 700, 1200, 1800, 2600)
+GOLDEN_MANIFEST = "manifest.json"
+
+class FrameCapture:
+    """Copies the presented screen at chosen frame numbers"""
+    
+    def __init__(self, frames):
+        self.frames = set(frames)
+        self.images = {}            # frame number -> (w, h, 3) uint8 pixels
+        
+    def grab(self, number, surface):
+        if number in self.frames:
+            self.images[number] = pygame.surfarray.array3d(surface)
+            
+def frame_hash(pixels):
+    """Content hash of a captured frame"""
+    return hashlib.blake2b(pixels.tobytes(), digest_size=16).hexdigest()
+
+def capture_frames(frames=CAPTURE_FRAMES, seed=0, upscaler="nearest"):
+    """Play the seeded bot run headless and return {frame: pixels}"""
+    game, agent = seeded_game(seed, upscaler=upscaler)
+    game.capture = FrameCapture(frames)
+    for _ in range(max(frames) + 1):
+        agent.play_frame(game)
+    return game.capture.images
+
+def _frame_name(number):
+    return f"frame_{number:05d}.png"
+
+def _save_pixels(pixels, path):
+    pygame.image.save(pygame.surfarray.make_surface(pixels), path)
+
+def diff_image(golden, actual, changed):
+    """Golden frame dimmed to grey with changed pixels in red"""
+    image = (golden.mean(axis=2, keepdims=True) * 0.4).astype(np.uint8).repeat(3, axis=2)
+    image[changed] = (255, 0, 0)
+    return image
+
+def compare_frames(images, golden_dir, out_dir, update=False, tolerance=0):
+    """Diff captured frames against goldens; returns one row per frame
+
+    Frames whose hash matches the manifest are not decoded at all. With
+    update=True the captures become the new goldens. Changed frames get
+    an actual_*.png and a diff_*.png in out_dir.
+    """
+    manifest_path = os.path.join(golden_dir, GOLDEN_MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    rows = []
+    for number, pixels in sorted(images.items()):
+        name = _frame_name(number)
+        digest = frame_hash(pixels)
+        row = {"frame": number, "hash": digest, "changed": 0, "max_delta": 0, "diff": None}
+        golden_path = os.path.join(golden_dir, name)
+        if update:
+            os.makedirs(golden_dir, exist_ok=True)
+            _save_pixels(pixels, golden_path)
+            manifest[name] = digest
+            row["status"] = "updated"
+        elif manifest.get(name) == digest:
+            row["status"] = "same"
+        elif not os.path.exists(golden_path):
+            row["status"] = "missing"
+        else:
+            golden = pygame.surfarray.array3d(pygame.image.load(golden_path))
+            if golden.shape != pixels.shape:
+                row.update(status="resized", changed=pixels.shape[0] * pixels.shape[1])
+            else:
+                delta = np.abs(golden.astype(np.int16) - pixels).max(axis=2)
+                changed = delta > tolerance
+                row["changed"] = int(changed.sum())
+                row["max_delta"] = int(delta.max())
+                row["status"] = "changed" if row["changed"] else "same"
+                if row["changed"]:
+                    os.makedirs(out_dir, exist_ok=True)
+                    row["diff"] = os.path.join(out_dir, "diff_" + name)
+                    _save_pixels(diff_image(golden, pixels, changed), row["diff"])
+                    _save_pixels(pixels, os.path.join(out_dir, "actual_" + name))
+        row["percent"] = 100 * row["changed"] / (pixels.shape[0] * pixels.shape[1])
+        rows.append(row)
+    if update:
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+    return rows
+
+def print_capture_report(rows):
+    failed = [row for row in rows if row["status"] not in ("same", "updated")]
+    print(f"Visual regression: {len(rows) - len(failed)}/{len(rows)} frames match")
+    for row in rows:
+        line = f"  frame {row['frame']:<6} {row['status']:<8}"
+        if row["changed"]:
+            line += (f" {row['changed']:7d} px ({row['percent']:.2f}%)"
+                     f"  max delta {row['max_delta']:3d}")
+        if row["diff"]:
+            line += f"  {row['diff']}"
+        print(line)
 
 # ============================================================================
 # LAUNCH THE GAME!
 # ============================================================================
 
+STARTUP = StartupTimeline(_STARTUP_MARKS)
+STARTUP.mark("module body", "import")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TF!DELTARUNE GBA Edition")
+    parser.add_argument("--profile", action="store_true",
+                        help="print per-section frame costs on exit")
+    parser.add_argument("--upscaler", choices=list(UPSCALERS), default="nearest",
+                        help="pixel-art filter used to scale the 240x160 frame")
+    parser.add_argument("--threaded", action="store_true",
+                        help="simulate on a worker thread and present on the main thread")
+    parser.add_argument("--poll-hz", type=int, default=POLL_HZ, metavar="HZ",
+                        help="input polls per second between frames (0: once per frame)")
+    parser.add_argument("--async", dest="use_asyncio", action="store_true",
+                        help="run frames as an asyncio task with background jobs in "
+                             "the idle time")
+    parser.add_argument("--bench-pipeline", type=float, metavar="SECONDS",
+                        help="play headless in both render modes and compare "
+                             "throughput, input latency and frame drops")
+    parser.add_argument("--playtest", type=int, metavar="RUNS",
+                        help="run RUNS seeded headless playtest bots in parallel and exit")
+    parser.add_argument("--playtest-frames", type=int, default=20000, metavar="N",
+                        help="frame limit per playtest run")
+    parser.add_argument("--playtest-json", metavar="PATH",
+                        help="write the full playtest report as JSON")
+    parser.add_argument("--jobs", type=int, metavar="N",
+                        help="worker processes for playtests (default: all cores)")
+    parser.add_argument("--bench-upscalers", action="store_true",
+                        help="time every upscaler and exit")
+    parser.add_argument("--bench-entities", type=int, metavar="N",
+                        help="time update + draw of N walking entities and exit")
+    parser.add_argument("--bench", nargs="*", metavar="CASE",
+                        help="run the headless benchmark suite (optionally only "
+                             "cases containing CASE) and exit")
+    parser.add_argument("--bench-repeat", type=int, default=50, metavar="N",
+                        help="timed runs per benchmark case")
+    parser.add_argument("--bench-json", metavar="PATH",
+                        help="write benchmark results as JSON")
+    parser.add_argument("--bench-baseline", metavar="PATH",
+                        help="compare against a stored JSON baseline; exit 1 on regression")
+    parser.add_argument("--bench-threshold", action="append", metavar="[CASE=]FRAC",
+                        help=f"allowed slowdown vs baseline (default {BENCH_THRESHOLD}); "
+                             "repeat with CASE= for per-case limits")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="start up in stages, print the startup timeline and exit")
+    parser.add_argument("--capture", metavar="GOLDEN_DIR",
+                        help="capture frames of a seeded headless run, diff them "
+                             "against the golden images in GOLDEN_DIR and exit")
+    parser.add_argument("--capture-frames", metavar="N,N,...",
+                        help="frame numbers to capture (default: "
+                             f"{','.join(map(str, CAPTURE_FRAMES))})")
+    parser.add_argument("--capture-seed", type=int, default=0, metavar="SEED",
+                        help="seed of the captured bot run")
+    parser.add_argument("--capture-out", default="capture_diffs", metavar="DIR",
+                        help="where diff and actual images of changed frames go")
+    parser.add_argument("--capture-update", action="store_true",
+                        help="store the captured frames as the new goldens")
+    args = parser.parse_args()
+    
+    if args.bench is not None:
+        results = run_benchmarks(args.bench, repeat=args.bench_repeat)
+        for name, result in results.items():
+            print(f"{name:<28} median {result['median_ms']:8.3f} ms  "
+                  f"p95 {result['p95_ms']:8.3f} ms"
+                  + (f"  {result['glyphs_per_sec'] / 1e6:.2f} M glyphs/s"
+                     if "glyphs_per_sec" in result else ""))
+        if args.bench_json:
+            with open(args.bench_json, "w") as f:
+                json.dump(bench_report(results), f, indent=2, sort_keys=True)
+        if args.bench_baseline:
+            with open(args.bench_baseline) as f:
+                baseline = json.load(f)["results"]
+            if args.bench:
+                baseline = {name: result for name, result in baseline.items()
+                            if any(pattern in name for pattern in args.bench)}
+            rows = compare_benchmarks(results, baseline,
+                                      parse_thresholds(args.bench_threshold))
+            print(f"Compared with {args.bench_baseline}:")
+            for name, before, after, ratio, status in rows:
+                change = f"{100 * (ratio - 1):+6.1f}%" if ratio is not None else "      "
+                print(f"  {name:<28} {change}  {status}")
+            if any(row[4] == "REGRESSION" for row in rows):
+                raise SystemExit(1)
+        raise SystemExit
+    
+    if args.bench_entities:
+        ms, static_ms = benchmark_entities(args.bench_entities)
+        print(f"{args.bench_entities} entities: {ms:.2f} ms/frame "
+              f"({100 * ms / (1000 / 60):.0f}% of the 60 FPS budget), "
+              f"static sprites {static_ms:.2f} ms/frame")
+        raise SystemExit
+    
+    if args.bench_pipeline:
+        for mode, result in measure_pipeline(args.bench_pipeline).items():
+            print(f"{mode:<9} {result['fps']:5.1f} FPS presented  "
+                  f"{result['sim_fps']:5.1f} simulated  "
+                  f"input {result['latency_ms']:5.1f} ms (p95 {result['latency_p95_ms']:5.1f})  "
+                  f"late {result['late']}  dropped {result['dropped']}")
+        raise SystemExit
+    
+    if args.playtest:
+        report = playtest_report(run_playtests(args.playtest, args.playtest_frames,
+                                               args.jobs))
+        print_playtest_report(report)
+        if args.playtest_json:
+            with open(args.playtest_json, "w") as f:
+                json.dump(report, f, indent=2)
+        raise SystemExit(1 if report["crashes"] or report["soft_locks"]
+                         or report["finished"] < report["runs"] else 0)
+    
+    if args.capture:
+        frames = (tuple(int(n) for n in args.capture_frames.split(","))
+                  if args.capture_frames else CAPTURE_FRAMES)
+        images = capture_frames(frames, seed=args.capture_seed, upscaler=args.upscaler)
+        rows = compare_frames(images, args.capture, args.capture_out,
+                              update=args.capture_update)
+        print_capture_report(rows)
+        raise SystemExit(1 if any(row["status"] not in ("same", "updated")
+                                  for row in rows) else 0)
+    
+    if args.bench_upscalers:
+        for mode, result in benchmark_upscalers().items():
+            print(f"{mode:<10} full {result['full_ms']:6.2f} ms  "
+                  f"cached {result['cached_ms']:6.2f} ms  ({result['fps']:.0f} FPS)")
+        raise SystemExit
+    
+    if args.startup_report:
+        game = TFDeltaRuneGBA(upscaler=args.upscaler, staged=True, timeline=STARTUP)
+        while game.startup_stages:
+            game.handle_events()
+            game.update()
+            game.draw()
+            game._startup_step()
+        print(STARTUP.report())
+        raise SystemExit
+    
     print("=" * 60)
     print("TF!DELTARUNE GBA EDITION")
     print("Chapters 1+2 - COMPLETE!")
@@ -1071,5 +4517,25 @@ if __name__ == "__main__":
     print("  SPACE - Rhythm Hit")
     print("=" * 60)
     
-    game = TFDeltaRuneGBA()
+    game = TFDeltaRuneGBA(upscaler=args.upscaler, threaded=args.threaded,
+                          use_asyncio=args.use_asyncio, poll_hz=args.poll_hz,
+                          staged=True, timeline=STARTUP)
     game.run()
+    if args.profile:
+        print(STARTUP.report())
+        print(game.profiler.report())
+        if args.threaded:
+            print(game.present_profiler.report())
+        if args.use_asyncio:
+            print(game.scheduler.report())
+        if game.synth.mixer is not None:    # Quit before the audio stage ran
+            print(game.synth.mixer.report())
+        print(game.assets.report())
+        stats = game.present_stats.summary()
+        print(f"Presented {stats['presented']} frames at {stats['fps']:.1f} FPS, "
+              f"input latency {stats['latency_ms']:.1f} ms (p95 {stats['latency_p95_ms']:.1f}), "
+              f"{stats['late']} late flips, {game.pipeline.dropped} dropped")
+        judged = game.input.latency_summary()
+        print(f"Judged {judged['judged']} presses, press-to-judgement latency "
+              f"{judged['latency_ms']:.1f} ms (p95 {judged['latency_p95_ms']:.1f}), "
+              f"{judged['dropped']} events dropped from the input ring")